@@ -339,6 +339,7 @@ const initSetup = async () => {
         form.category_slots.value = settings.category_slots || 1;
         form.warn_threshold.value = settings.warn_threshold || 3;
         form.warn_timeout_minutes.value = settings.warn_timeout_minutes || 10;
+        form.custom_keywords.value = (settings.custom_keywords || []).join(', ');
         form.enable_smart_replies.checked = !!settings.enable_smart_replies;
         form.enable_ai_suggestions.checked = !!settings.enable_ai_suggestions;
         form.enable_auto_priority.checked = !!settings.enable_auto_priority;
@@ -362,6 +363,7 @@ const initSetup = async () => {
         category_slots: Number(form.category_slots.value || 1),
         warn_threshold: Number(form.warn_threshold.value || 3),
         warn_timeout_minutes: Number(form.warn_timeout_minutes.value || 10),
+        custom_keywords: form.custom_keywords.value,
         enable_smart_replies: form.enable_smart_replies.checked,
         enable_ai_suggestions: form.enable_ai_suggestions.checked,
         enable_auto_priority: form.enable_auto_priority.checked,
@@ -1,3 +1,6 @@
+import functools
+import re
+
 AGGRESSIVE_WORDS = [
     "idiot",
     "stupid",
@@ -16,10 +19,105 @@ AGGRESSIVE_WORDS = [
     "cuxxl",
 ]
 
+SUGGESTIONS = [
+    ("banned", "Provide ban-appeal steps and request context (username, reason, appeal notes)."),
+    ("refund", "Ask for order ID, payment method, and transaction date."),
+    ("chargeback", "Request evidence and explain chargeback policy."),
+    ("scam", "Ask for screenshots, user IDs, and transaction links."),
+]
+
+MAX_CUSTOM_KEYWORDS = 100
+_SUFFIXES = ("", "s", "es", "d", "ed", "ing", "er", "ers", "ster", "sters")
+_WORD = re.compile(r"[^\W_]+")
+# ASCII fast path with the same result as _WORD: every byte but [a-z0-9] becomes a space.
+_ASCII_SEPARATORS = bytes(b if chr(b) in "abcdefghijklmnopqrstuvwxyz0123456789" else 32 for b in range(256))
+
+
+def tokenize_words(text: str | None):
+    # Anything that is not a Unicode letter or digit separates words, so emoji,
+    # curly quotes, dashes and no-break spaces cannot hide a keyword.
+    lower = (text or "").lower()
+    if lower.isascii():
+        return lower.encode().translate(_ASCII_SEPARATORS).decode().split()
+    return _WORD.findall(lower)
+
+
+def normalize_keywords(words):
+    # Accepts a list or a comma/newline separated string; keeps first-seen order.
+    # Keywords are reduced to the word tokens the matcher sees ("n1gg@" -> "n1gg").
+    if isinstance(words, str):
+        words = re.split(r"[,\n]", words)
+    seen = {}
+    for word in words or []:
+        word = " ".join(tokenize_words(str(word)))[:32].strip()
+        if word:
+            seen.setdefault(word, None)
+    return list(seen)[:MAX_CUSTOM_KEYWORDS]
+
+
+def _forms(term: str):
+    # Whole word plus common inflections: "scammer", "refunded", "hating".
+    stems = {term, term + term[-1]}
+    if term.endswith("e"):
+        stems.add(term[:-1])
+    return {stem + suffix for stem in stems for suffix in _SUFFIXES} - {term[:-1]} | {term}
+
+
+class KeywordMatcher:
+    def __init__(self, flagged: list[str], suggestions: list[tuple[str, str]]):
+        # Text is split into words once and intersected with every inflected
+        # form of every term, so cost does not grow with the word list and
+        # terms never match inside other words ("skill").
+        self.flagged = list(dict.fromkeys(flagged))
+        self.suggestions = suggestions
+        terms = list(dict.fromkeys([*self.flagged, *(key for key, _ in suggestions)]))
+        self._forms = {}
+        phrases = []
+        for term in terms:
+            if _WORD.fullmatch(term):
+                for form in _forms(term):
+                    self._forms.setdefault(form, term)
+            else:
+                phrases.append(term)
+        self._form_set = frozenset(self._forms)
+        # Multi-word custom phrases are rare; they get one regex over the
+        # space-joined tokens, so any separator between their words matches.
+        self._phrases = {phrase.lower(): phrase for phrase in phrases}
+        self._phrase_pattern = re.compile(r"\b(?:" + "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)) + r")\b") if phrases else None
 
-def analyze_priority(text: str, recent_tickets: int, repeated_reports: int):
-    lower = text.lower()
-    hits = [w for w in AGGRESSIVE_WORDS if w in lower]
+    def scan(self, text: str):
+        words = tokenize_words(text)
+        found = {self._forms[word] for word in self._form_set.intersection(words)}
+        if self._phrase_pattern:
+            found.update(self._phrases[m] for m in self._phrase_pattern.findall(" ".join(words)))
+        if not found:
+            return {"flagged": [], "suggestions": []}
+        return {
+            "flagged": [t for t in self.flagged if t in found],
+            "suggestions": [text for key, text in self.suggestions if key in found],
+        }
+
+
+@functools.lru_cache(maxsize=512)
+def _compile(custom: tuple):
+    return KeywordMatcher(AGGRESSIVE_WORDS + normalize_keywords(custom), SUGGESTIONS)
+
+
+def matcher_for(settings: dict | None = None):
+    # Compiled once per distinct word list, i.e. once per settings change.
+    custom = (settings or {}).get("custom_keywords") or ()
+    if isinstance(custom, str):
+        # tuple() would split a raw string into characters.
+        custom = normalize_keywords(custom)
+    return _compile(tuple(custom))
+
+
+def scan_text(text: str, settings: dict | None = None):
+    return matcher_for(settings).scan(text or "")
+
+
+def analyze_priority(text: str, recent_tickets: int, repeated_reports: int, settings: dict | None = None):
+    hits = scan_text(text, settings)["flagged"]
     reasons = []
     if recent_tickets >= 3:
         reasons.append("High ticket volume in 24h")
@@ -30,19 +128,9 @@ def analyze_priority(text: str, recent_tickets: int, repeated_reports: int):
     return {"priority": "HIGH" if reasons else "NORMAL", "reason": " - ".join(reasons) if reasons else None}
 
 
-def find_aggressive_words(text: str):
-    lower = text.lower()
-    return [w for w in AGGRESSIVE_WORDS if w in lower]
-
-
-SUGGESTIONS = [
-    ("banned", "Provide ban-appeal steps and request context (username, reason, appeal notes)."),
-    ("refund", "Ask for order ID, payment method, and transaction date."),
-    ("chargeback", "Request evidence and explain chargeback policy."),
-    ("scam", "Ask for screenshots, user IDs, and transaction links."),
-]
+def find_aggressive_words(text: str, settings: dict | None = None):
+    return scan_text(text, settings)["flagged"]
 
 
-def suggestions_from_text(text: str):
-    lower = text.lower()
-    return [s for k, s in SUGGESTIONS if k in lower]
+def suggestions_from_text(text: str, settings: dict | None = None):
+    return scan_text(text, settings)["suggestions"]
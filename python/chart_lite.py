@@ -0,0 +1,179 @@
+import functools
+import io
+import math
+import struct
+import zlib
+
+WIDTH, HEIGHT = 840, 420
+LEFT, RIGHT, TOP, BOTTOM = 56, 16, 16, 56
+BACKGROUND = (0x1B, 0x1D, 0x22)
+GRID = (0x2A, 0x2A, 0x2A)
+LINE = (0x7C, 0x5C, 0xFF)
+TEXT = (0xD0, 0xD0, 0xD0)
+
+# 3x5 bitmap glyphs, enough for tick values and "%b %d" date labels.
+_GLYPHS = {
+    "0": "### #.# #.# #.# ###", "1": ".#. ##. .#. .#. ###", "2": "### ..# ### #.. ###", "3": "### ..# ### ..# ###",
+    "4": "#.# #.# ### ..# ..#", "5": "### #.. ### ..# ###", "6": "### #.. ### #.# ###", "7": "### ..# ..# ..# ..#",
+    "8": "### #.# ### #.# ###", "9": "### #.# ### ..# ###", "A": ".#. #.# ### #.# #.#", "B": "##. #.# ##. #.# ##.",
+    "C": "### #.. #.. #.. ###", "D": "##. #.# #.# #.# ##.", "E": "### #.. ### #.. ###", "F": "### #.. ### #.. #..",
+    "G": "### #.. #.# #.# ###", "J": "..# ..# ..# #.# ###", "L": "#.. #.. #.. #.. ###", "M": "#.# ### ### #.# #.#",
+    "N": "##. #.# #.# #.# #.#", "O": "### #.# #.# #.# ###", "P": "### #.# ### #.. #..", "R": "##. #.# ##. #.# #.#",
+    "S": "### #.. ### ..# ###", "T": "### .#. .#. .#. .#.", "U": "#.# #.# #.# #.# ###", "V": "#.# #.# #.# #.# .#.",
+    "Y": "#.# #.# .#. .#. .#.", "/": "..# ..# .#. #.. #..", "-": "... ... ### ... ...",
+    " ": "... ... ... ... ...",
+}
+_SCALE = 2
+
+
+def _blend(top: tuple, bottom: tuple, alpha: float):
+    return tuple(int(round(t * alpha + b * (1 - alpha))) for t, b in zip(top, bottom))
+
+
+def _nice_step(peak: int, ticks: int = 4):
+    raw = max(peak, 1) / ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for factor in (1, 2, 5, 10):
+        if raw <= factor * magnitude:
+            return max(1, int(factor * magnitude))
+    return max(1, int(10 * magnitude))
+
+
+def _layout(points: list[dict], peak: int | None):
+    values = [p["value"] for p in points]
+    peak = max(values, default=0) if peak is None else peak
+    step = _nice_step(peak)
+    top_value = max(step, math.ceil(peak / step) * step)
+    plot_w, plot_h = WIDTH - LEFT - RIGHT, HEIGHT - TOP - BOTTOM
+    count = len(values)
+    xs = [LEFT + (plot_w * i / (count - 1) if count > 1 else plot_w / 2) for i in range(count)]
+    ys = [TOP + plot_h * (1 - v / top_value) for v in values]
+    yticks = [(v, TOP + plot_h * (1 - v / top_value)) for v in range(0, top_value + 1, step)]
+    every = max(1, math.ceil(count / 8))
+    xticks = [(points[i]["label"], xs[i]) for i in range(0, count, every)]
+    return xs, ys, yticks, xticks
+
+
+@functools.lru_cache(maxsize=8)
+def _offsets(radius: float):
+    r = math.ceil(radius)
+    return tuple((dx, dy) for dy in range(-r, r + 1) for dx in range(-r, r + 1) if dx * dx + dy * dy <= radius * radius)
+
+
+class _Canvas:
+    def __init__(self):
+        self.rows = [bytearray(bytes(BACKGROUND) * WIDTH) for _ in range(HEIGHT)]
+
+    def get(self, x: int, y: int):
+        row = self.rows[y]
+        return tuple(row[x * 3:x * 3 + 3])
+
+    def set(self, x: int, y: int, color: tuple, alpha: float = 1.0):
+        if 0 <= x < WIDTH and 0 <= y < HEIGHT:
+            self.rows[y][x * 3:x * 3 + 3] = bytes(color if alpha >= 1 else _blend(color, self.get(x, y), alpha))
+
+    def fill_under(self, tops: list[int], base: int, color: tuple):
+        # Painted row by row on the untouched background, so each row is one join.
+        fill, background = bytes(color), bytes(BACKGROUND)
+        for y in range(max(0, min(tops)), min(HEIGHT - 1, base) + 1):
+            self.rows[y] = bytearray(b"".join(fill if top <= y else background for top in tops))
+
+    def disk(self, cx: float, cy: float, radius: float, color: tuple):
+        cx, cy = int(round(cx)), int(round(cy))
+        pixel = bytes(color)
+        rows = self.rows
+        for dx, dy in _offsets(radius):
+            x, y = cx + dx, cy + dy
+            if 0 <= x < WIDTH and 0 <= y < HEIGHT:
+                rows[y][x * 3:x * 3 + 3] = pixel
+
+    def line(self, x0: float, y0: float, x1: float, y1: float, color: tuple, width: float = 1.0, dash: int = 0, alpha: float = 1.0):
+        steps = max(1, int(max(abs(x1 - x0), abs(y1 - y0)) * 2))
+        seen = set()
+        for i in range(steps + 1):
+            if dash and (i // (dash * 2)) % 2:
+                continue
+            pixel = (int(round(x0 + (x1 - x0) * i / steps)), int(round(y0 + (y1 - y0) * i / steps)))
+            if pixel in seen:
+                continue
+            seen.add(pixel)
+            if width <= 1:
+                self.set(*pixel, color, alpha)
+            else:
+                self.disk(*pixel, width / 2, color)
+
+    def text(self, x: float, y: float, label: str, color: tuple, anchor: str = "left"):
+        label = label.upper()
+        width = len(label) * 4 * _SCALE - _SCALE
+        left = int(x - width) if anchor == "right" else int(x - width / 2) if anchor == "center" else int(x)
+        for idx, char in enumerate(label):
+            rows = _GLYPHS.get(char, _GLYPHS[" "]).split()
+            for gy, bits in enumerate(rows):
+                for gx in (i for i, on in enumerate(bits) if on == "#"):
+                    for sx in range(_SCALE):
+                        for sy in range(_SCALE):
+                            self.set(left + (idx * 4 + gx) * _SCALE + sx, int(y) + gy * _SCALE + sy, color)
+
+    def png(self):
+        def chunk(tag: bytes, data: bytes):
+            return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+        raw = b"".join(b"\x00" + bytes(row) for row in self.rows)
+        header = struct.pack(">IIBBBBB", WIDTH, HEIGHT, 8, 2, 0, 0, 0)
+        return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b"")
+
+
+def render_png(points: list[dict], peak: int | None = None):
+    xs, ys, yticks, xticks = _layout(points, peak)
+    canvas = _Canvas()
+    base = HEIGHT - BOTTOM
+    fill = _blend(LINE, BACKGROUND, 0.15)
+    tops = [HEIGHT] * WIDTH
+    seg = 0
+    for x in range(math.ceil(xs[0]), int(xs[-1]) + 1 if len(xs) > 1 else 0):
+        while seg < len(xs) - 2 and x > xs[seg + 1]:
+            seg += 1
+        t = (x - xs[seg]) / (xs[seg + 1] - xs[seg])
+        tops[x] = int(round(ys[seg] + (ys[seg + 1] - ys[seg]) * t))
+    canvas.fill_under(tops, base, fill)
+    for _, y in yticks:
+        canvas.line(LEFT, y, WIDTH - RIGHT, y, GRID, dash=3, alpha=0.6)
+    for _, x in xticks:
+        canvas.line(x, TOP, x, base, GRID, dash=3, alpha=0.6)
+    for i in range(len(xs) - 1):
+        canvas.line(xs[i], ys[i], xs[i + 1], ys[i + 1], LINE, width=3)
+    for x, y in zip(xs, ys):
+        canvas.disk(x, y, 3.5, LINE)
+    canvas.line(LEFT, TOP, LEFT, base, TEXT)
+    canvas.line(LEFT, base, WIDTH - RIGHT, base, TEXT)
+    for value, y in yticks:
+        canvas.text(LEFT - 8, y - 5, str(value), TEXT, anchor="right")
+    for label, x in xticks:
+        canvas.text(x, base + 10, label, TEXT, anchor="center")
+    return canvas.png()
+
+
+def render_svg(points: list[dict], peak: int | None = None):
+    xs, ys, yticks, xticks = _layout(points, peak)
+    base = HEIGHT - BOTTOM
+    hexcolor = lambda c: "#%02x%02x%02x" % c
+    path = " ".join(f"{x:.1f},{y:.1f}" for x, y in zip(xs, ys))
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{HEIGHT}" viewBox="0 0 {WIDTH} {HEIGHT}" font-family="sans-serif" font-size="12">',
+        f'<rect width="100%" height="100%" fill="{hexcolor(BACKGROUND)}"/>',
+    ]
+    parts += [f'<line x1="{LEFT}" y1="{y:.1f}" x2="{WIDTH - RIGHT}" y2="{y:.1f}" stroke="{hexcolor(GRID)}" stroke-dasharray="3 3" stroke-opacity="0.6"/>' for _, y in yticks]
+    parts += [f'<line x1="{x:.1f}" y1="{TOP}" x2="{x:.1f}" y2="{base}" stroke="{hexcolor(GRID)}" stroke-dasharray="3 3" stroke-opacity="0.6"/>' for _, x in xticks]
+    if xs:
+        parts.append(f'<polygon points="{xs[0]:.1f},{base} {path} {xs[-1]:.1f},{base}" fill="{hexcolor(LINE)}" fill-opacity="0.15"/>')
+        parts.append(f'<polyline points="{path}" fill="none" stroke="{hexcolor(LINE)}" stroke-width="3" stroke-linejoin="round"/>')
+    parts += [f'<circle cx="{x:.1f}" cy="{y:.1f}" r="3.5" fill="{hexcolor(LINE)}"/>' for x, y in zip(xs, ys)]
+    parts.append(f'<path d="M{LEFT},{TOP} V{base} H{WIDTH - RIGHT}" fill="none" stroke="{hexcolor(TEXT)}"/>')
+    parts += [f'<text x="{LEFT - 8}" y="{y + 4:.1f}" text-anchor="end" fill="{hexcolor(TEXT)}">{value}</text>' for value, y in yticks]
+    parts += [f'<text x="{x:.1f}" y="{base + 20}" text-anchor="middle" fill="{hexcolor(TEXT)}">{label}</text>' for label, x in xticks]
+    parts.append("</svg>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def render_chart(points: list[dict], filename: str, peak: int | None = None):
+    data = render_svg(points, peak) if filename.endswith(".svg") else render_png(points, peak)
+    return {"buffer": io.BytesIO(data), "filename": filename}
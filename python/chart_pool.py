@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import io
+import json
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .charts import render_windows
+
+
+def _warm(renderer: str):
+    # Runs once per worker so every chart after the first skips the matplotlib import.
+    if renderer == "matplotlib":
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot  # noqa: F401
+
+
+def _render_pngs(points: list[dict], windows: tuple, renderer: str):
+    return {days: chart["buffer"].getvalue() for days, chart in render_windows(points, windows, renderer).items()}
+
+
+class ChartRenderer:
+    def __init__(self, workers: int = 1, cache_bytes: int = 8 * 1024 * 1024, renderer: str = "matplotlib"):
+        self.workers = workers
+        self.renderer = renderer
+        self.cache_bytes = cache_bytes
+        self._pool: ProcessPoolExecutor | None = None
+        self._cache: OrderedDict[tuple, bytes] = OrderedDict()
+        self._size = 0
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+        self.evictions = 0
+
+    def _executor(self):
+        # workers=0 keeps rendering in-process, on the default thread pool.
+        if self.workers > 0 and self._pool is None:
+            # spawn, not fork: forking a process that already runs threads
+            # (to_thread index builds, resolver threads) can copy held locks.
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_warm, initargs=(self.renderer,))
+        return self._pool
+
+    async def render_windows(self, guild_id: str, user_id: str, points: list[dict], windows: tuple = (7, 30, 90)):
+        # Every window is a suffix of the same series, so one digest covers them all.
+        digest = hashlib.sha1(json.dumps(points, separators=(",", ":")).encode("utf-8")).hexdigest()
+        keys = {days: (guild_id, user_id, days, digest) for days in windows}
+        images = {}
+        for days, key in keys.items():
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                images[days] = data
+        missing = tuple(days for days in windows if days not in images)
+        if missing:
+            job = (guild_id, user_id, digest, missing)
+            future = self._inflight.get(job)
+            if future is None:
+                self.misses += len(missing)
+                future = self._inflight[job] = asyncio.ensure_future(self._render(points, {days: keys[days] for days in missing}))
+                future.add_done_callback(lambda _: self._inflight.pop(job, None))
+            images.update(await asyncio.shield(future))
+        return [{"buffer": io.BytesIO(images[days]), "filename": f"activity-{days}d.png"} for days in windows]
+
+    async def _render(self, points: list[dict], keys: dict):
+        loop = asyncio.get_running_loop()
+        try:
+            rendered = await loop.run_in_executor(self._executor(), _render_pngs, points, tuple(keys), self.renderer)
+        except BrokenProcessPool:
+            # A worker died (usually OOM); start a fresh pool on the next render.
+            self._pool = None
+            raise
+        self.renders += len(rendered)
+        for days, data in rendered.items():
+            self._store(keys[days], data)
+        return rendered
+
+    def _store(self, key: tuple, data: bytes):
+        if len(data) > self.cache_bytes:
+            return
+        self._cache[key] = data
+        self._size += len(data)
+        while self._size > self.cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "renderer": self.renderer,
+            "workers": self.workers,
+            "pool_started": self._pool is not None,
+            "cached": len(self._cache),
+            "cached_bytes": self._size,
+            "max_bytes": self.cache_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "renders": self.renders,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+        }
@@ -1,7 +1,11 @@
 import io
+import threading
 from datetime import datetime, timedelta
 
-import matplotlib.pyplot as plt
+from . import chart_lite
+
+# pyplot keeps global figure state; in-process renders (CHART_WORKERS=0) run on threads.
+_PYPLOT_LOCK = threading.Lock()
 
 
 def build_daily_series(days: int, records: list[dict], timezone: str):
@@ -21,25 +25,49 @@ def build_daily_series(days: int, records: list[dict], timezone: str):
     return series
 
 
-def render_chart(points: list[dict], filename: str):
+def render_chart(points: list[dict], filename: str, renderer: str = "matplotlib", peak: int | None = None):
+    if renderer == "lite":
+        return chart_lite.render_chart(points, filename, peak)
+    return _render_matplotlib(points, filename)
+
+
+def render_windows(points: list[dict], windows: tuple = (7, 30, 90), renderer: str = "matplotlib", ext: str = "png"):
+    # A single backwards pass over the series gives every window's peak.
+    wanted = set(windows)
+    peaks = {}
+    peak = 0
+    for days, point in enumerate(reversed(points), 1):
+        peak = max(peak, point["value"])
+        if days in wanted:
+            peaks[days] = peak
+    return {
+        days: render_chart(points[-days:], f"activity-{days}d.{ext}", renderer, peaks.get(days, peak))
+        for days in windows
+    }
+
+
+def _render_matplotlib(points: list[dict], filename: str):
+    # Imported on first use so the lite renderer never pays for matplotlib.
+    import matplotlib.pyplot as plt
+
     labels = [p["label"] for p in points]
     values = [p["value"] for p in points]
 
-    plt.style.use("dark_background")
-    fig, ax = plt.subplots(figsize=(6, 3))
-    ax.plot(labels, values, color="#7C5CFF", linewidth=2, marker="o", markersize=4)
-    ax.fill_between(range(len(values)), values, color="#7C5CFF", alpha=0.15)
-    ax.grid(color="#2a2a2a", linestyle="--", linewidth=0.6, alpha=0.6)
-    ax.set_facecolor("#1b1d22")
-    fig.patch.set_facecolor("#1b1d22")
-    ax.tick_params(axis="x", rotation=45, labelsize=7)
-    ax.tick_params(axis="y", labelsize=7)
-    ax.spines["top"].set_visible(False)
-    ax.spines["right"].set_visible(False)
-
-    buf = io.BytesIO()
-    fig.tight_layout()
-    fig.savefig(buf, format="png", dpi=140)
-    plt.close(fig)
-    buf.seek(0)
-    return {"buffer": buf, "filename": filename}
+    with _PYPLOT_LOCK, plt.style.context("dark_background"):
+        fig, ax = plt.subplots(figsize=(6, 3))
+        ax.plot(labels, values, color="#7C5CFF", linewidth=2, marker="o", markersize=4)
+        ax.fill_between(range(len(values)), values, color="#7C5CFF", alpha=0.15)
+        ax.grid(color="#2a2a2a", linestyle="--", linewidth=0.6, alpha=0.6)
+        ax.set_facecolor("#1b1d22")
+        fig.patch.set_facecolor("#1b1d22")
+        ax.tick_params(axis="x", rotation=45, labelsize=7)
+        ax.tick_params(axis="y", labelsize=7)
+        ax.spines["top"].set_visible(False)
+        ax.spines["right"].set_visible(False)
+
+        buf = io.BytesIO()
+        fig.tight_layout()
+        fig.savefig(buf, format="png", dpi=140)
+        plt.close(fig)
+        buf.seek(0)
+        return {"buffer": buf, "filename": filename}
@@ -19,6 +19,28 @@ class Config:
     guild_id: str | None
     oauth_redirect_uri: str | None
     session_secret: str | None
+    data_backend: str
+    db_max_concurrency: int
+    cache_ttl_seconds: float
+    cache_max_guilds: int
+    context_cache_ttl_seconds: float
+    activity_flush_seconds: float
+    render_debounce_seconds: float
+    interaction_defer_budget_ms: int
+    chart_workers: int
+    chart_cache_mb: int
+    chart_renderer: str
+    transcript_spool_kb: int
+    transcript_gzip: bool
+    transcript_archive: bool
+    command_hash_path: str
+    force_command_sync: bool
+    transcript_concurrency: int
+    transcript_guild_concurrency: int
+    signal_sync_seconds: float
+    similar_tickets: int
+    duplicate_threshold: float
+    duplicate_auto_link: bool
 
 
 def load_config() -> Config:
@@ -34,4 +56,26 @@ def load_config() -> Config:
         guild_id=os.getenv("GUILD_ID"),
         oauth_redirect_uri=os.getenv("OAUTH_REDIRECT_URI"),
         session_secret=os.getenv("SESSION_SECRET"),
+        data_backend=os.getenv("DATA_BACKEND", "thread"),
+        db_max_concurrency=int(os.getenv("DB_MAX_CONCURRENCY", "10")),
+        cache_ttl_seconds=float(os.getenv("CACHE_TTL_SECONDS", "60")),
+        cache_max_guilds=int(os.getenv("CACHE_MAX_GUILDS", "1024")),
+        context_cache_ttl_seconds=float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "30")),
+        activity_flush_seconds=float(os.getenv("ACTIVITY_FLUSH_SECONDS", "2")),
+        render_debounce_seconds=float(os.getenv("RENDER_DEBOUNCE_SECONDS", "0.75")),
+        interaction_defer_budget_ms=int(os.getenv("INTERACTION_DEFER_BUDGET_MS", "2000")),
+        chart_workers=int(os.getenv("CHART_WORKERS", "1")),
+        chart_cache_mb=int(os.getenv("CHART_CACHE_MB", "8")),
+        chart_renderer=os.getenv("CHART_RENDERER", "matplotlib"),
+        transcript_spool_kb=int(os.getenv("TRANSCRIPT_SPOOL_KB", "512")),
+        transcript_gzip=os.getenv("TRANSCRIPT_GZIP", "false").lower() in ("1", "true", "yes"),
+        transcript_archive=os.getenv("TRANSCRIPT_ARCHIVE", "true").lower() in ("1", "true", "yes"),
+        command_hash_path=os.getenv("COMMAND_HASH_PATH", ".command_hash.json"),
+        force_command_sync=os.getenv("FORCE_COMMAND_SYNC", "false").lower() in ("1", "true", "yes"),
+        transcript_concurrency=int(os.getenv("TRANSCRIPT_CONCURRENCY", "2")),
+        transcript_guild_concurrency=int(os.getenv("TRANSCRIPT_GUILD_CONCURRENCY", "1")),
+        signal_sync_seconds=float(os.getenv("SIGNAL_SYNC_SECONDS", "30")),
+        similar_tickets=int(os.getenv("SIMILAR_TICKETS", "3")),
+        duplicate_threshold=float(os.getenv("DUPLICATE_THRESHOLD", "0.7")),
+        duplicate_auto_link=os.getenv("DUPLICATE_AUTO_LINK", "true").lower() in ("1", "true", "yes"),
     )
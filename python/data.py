@@ -1,200 +1,363 @@
 import asyncio
 from typing import Any
 
+from .cache import MISSING, TTLCache
+
+# Ticket columns that feed user_ticket_history and therefore the cached context.
+_HISTORY_FIELDS = {"created_at", "closed_at"}
+
 
 class DataRepo:
-    def __init__(self, supabase):
+    def __init__(self, supabase, cache_ttl: float = 60.0, cache_size: int = 1024, context_ttl: float = 30.0):
         self.sb = supabase
+        self.settings_cache = TTLCache(cache_size, cache_ttl)
+        self.categories_cache = TTLCache(cache_size, cache_ttl)
+        self.context_cache = TTLCache(cache_size, context_ttl)
+        self._context_version = 0
+        self.is_async = getattr(supabase, "is_async", False)
+        self._thread_in_flight = 0
+        self._thread_requests = 0
 
     async def _run(self, fn):
         return await asyncio.to_thread(fn)
 
+    async def _execute(self, query):
+        if self.is_async:
+            return await query.execute()
+        self._thread_in_flight += 1
+        self._thread_requests += 1
+        try:
+            return await self._run(query.execute)
+        finally:
+            self._thread_in_flight -= 1
+
+    def stats(self):
+        if self.is_async:
+            db = self.sb.stats()
+        else:
+            db = {"backend": "thread", "in_flight": self._thread_in_flight, "requests": self._thread_requests}
+        return {
+            "db": db,
+            "settings_cache": self.settings_cache.stats(),
+            "categories_cache": self.categories_cache.stats(),
+            "context_cache": self.context_cache.stats(),
+        }
+
+    async def close(self):
+        if self.is_async:
+            await self.sb.aclose()
+
     async def get_guild_settings(self, guild_id: str):
-        def _():
-            res = self.sb.table("guild_settings").select("*").eq("guild_id", guild_id).execute()
-            return res.data[0] if res.data else None
-        return await self._run(_)
+        cached = self.settings_cache.get(str(guild_id))
+        if cached is not MISSING:
+            return cached
+        res = await self._execute(self.sb.table("guild_settings").select("*").eq("guild_id", guild_id))
+        settings = res.data[0] if res.data else None
+        self.settings_cache.set(str(guild_id), settings)
+        return settings
 
     async def upsert_guild_settings(self, payload: dict):
-        def _():
-            res = self.sb.table("guild_settings").upsert(payload).execute()
-            return res.data[0] if res.data else None
-        return await self._run(_)
+        res = await self._execute(self.sb.table("guild_settings").upsert(payload))
+        self.settings_cache.invalidate(str(payload.get("guild_id")))
+        return res.data[0] if res.data else None
 
     async def list_categories(self, guild_id: str):
-        def _():
-            res = self.sb.table("ticket_categories").select("*").eq("guild_id", guild_id).order("id").execute()
-            return res.data or []
-        return await self._run(_)
+        cached = self.categories_cache.get(str(guild_id))
+        if cached is not MISSING:
+            return cached
+        res = await self._execute(self.sb.table("ticket_categories").select("*").eq("guild_id", guild_id).order("id"))
+        categories = res.data or []
+        self.categories_cache.set(str(guild_id), categories)
+        return categories
 
     async def count_tickets(self, guild_id: str, status: str | None = None, since_iso: str | None = None, time_field: str = "created_at"):
-        def _():
-            q = self.sb.table("tickets").select("id", count="exact").eq("guild_id", guild_id)
-            if status:
-                q = q.eq("status", status)
-            if since_iso:
-                q = q.gte(time_field, since_iso)
-            res = q.execute()
-            return res.count or 0
-        return await self._run(_)
+        q = self.sb.table("tickets").select("id", count="exact").eq("guild_id", guild_id)
+        if status:
+            q = q.eq("status", status)
+        if since_iso:
+            q = q.gte(time_field, since_iso)
+        res = await self._execute(q)
+        return res.count or 0
 
     async def list_recent_tickets(self, guild_id: str, limit: int = 6):
-        def _():
-            res = (
-                self.sb.table("tickets")
-                .select("id,status,created_at,creator_id,category_name,priority,query_text")
-                .eq("guild_id", guild_id)
-                .order("created_at", desc=True)
-                .limit(limit)
-                .execute()
-            )
-            return res.data or []
-        return await self._run(_)
+        res = await self._execute(
+            self.sb.table("tickets")
+            .select("id,status,created_at,creator_id,category_name,priority,query_text")
+            .eq("guild_id", guild_id)
+            .order("created_at", desc=True)
+            .limit(limit)
+        )
+        return res.data or []
 
     async def list_closed_tickets(self, guild_id: str, limit: int = 200):
-        def _():
-            res = (
-                self.sb.table("tickets")
-                .select("created_at,closed_at,avg_response_ms")
-                .eq("guild_id", guild_id)
-                .eq("status", "CLOSED")
-                .order("closed_at", desc=True)
-                .limit(limit)
-                .execute()
-            )
-            return res.data or []
-        return await self._run(_)
+        res = await self._execute(
+            self.sb.table("tickets")
+            .select("created_at,closed_at,avg_response_ms")
+            .eq("guild_id", guild_id)
+            .eq("status", "CLOSED")
+            .order("closed_at", desc=True)
+            .limit(limit)
+        )
+        return res.data or []
+
+    async def list_closed_ticket_texts(self, guild_id: str, closed_since: str | None = None, page_size: int = 1000):
+        rows = []
+        last_id = 0
+        while True:
+            q = self.sb.table("tickets").select("id,query_text").eq("guild_id", guild_id).eq("status", "CLOSED").gt("id", last_id)
+            if closed_since:
+                q = q.gte("closed_at", closed_since)
+            res = await self._execute(q.order("id").limit(page_size))
+            page = res.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            last_id = page[-1]["id"]
 
     async def list_ticket_times(self, guild_id: str, since_iso: str):
-        def _():
-            res = (
-                self.sb.table("tickets")
-                .select("created_at")
-                .eq("guild_id", guild_id)
-                .gte("created_at", since_iso)
-                .order("created_at")
-                .execute()
-            )
-            return res.data or []
-        return await self._run(_)
+        res = await self._execute(
+            self.sb.table("tickets")
+            .select("created_at")
+            .eq("guild_id", guild_id)
+            .gte("created_at", since_iso)
+            .order("created_at")
+        )
+        return res.data or []
 
     async def list_ticket_users(self, guild_id: str, since_iso: str):
-        def _():
-            res = (
-                self.sb.table("tickets")
-                .select("creator_id,claimed_by,closed_by,created_at")
-                .eq("guild_id", guild_id)
-                .gte("created_at", since_iso)
-                .execute()
-            )
-            return res.data or []
-        return await self._run(_)
+        res = await self._execute(
+            self.sb.table("tickets")
+            .select("creator_id,claimed_by,closed_by,created_at")
+            .eq("guild_id", guild_id)
+            .gte("created_at", since_iso)
+        )
+        return res.data or []
 
     async def create_category(self, guild_id: str, name: str, description: str | None):
-        def _():
-            res = self.sb.table("ticket_categories").insert({
-                "guild_id": guild_id,
-                "name": name,
-                "description": description,
-            }).execute()
-            return res.data[0] if res.data else None
-        return await self._run(_)
+        res = await self._execute(self.sb.table("ticket_categories").insert({
+            "guild_id": guild_id,
+            "name": name,
+            "description": description,
+        }))
+        self.categories_cache.invalidate(str(guild_id))
+        return res.data[0] if res.data else None
+
+    async def delete_category(self, guild_id: str, category_id: int):
+        res = await self._execute(self.sb.table("ticket_categories").delete().eq("id", category_id).eq("guild_id", guild_id))
+        self.categories_cache.invalidate(str(guild_id))
+        return res.data[0] if res.data else None
 
     async def create_ticket(self, payload: dict):
-        def _():
-            res = self.sb.table("tickets").insert(payload).execute()
-            return res.data[0] if res.data else None
-        return await self._run(_)
+        res = await self._execute(self.sb.table("tickets").insert(payload))
+        self._invalidate_user_context(payload.get("guild_id"), payload.get("creator_id"))
+        return res.data[0] if res.data else None
+
+    async def next_ticket_id(self):
+        res = await self._execute(self.sb.rpc("next_ticket_id", {}))
+        return int(res.data)
 
     async def update_ticket(self, ticket_id: int, payload: dict):
-        def _():
-            res = self.sb.table("tickets").update(payload).eq("id", ticket_id).execute()
-            return res.data[0] if res.data else None
-        return await self._run(_)
+        res = await self._execute(self.sb.table("tickets").update(payload).eq("id", ticket_id))
+        row = res.data[0] if res.data else None
+        if row and _HISTORY_FIELDS & payload.keys():
+            self._invalidate_user_context(row["guild_id"], row["creator_id"])
+        return row
 
     async def update_ticket_by_message(self, message_id: str, payload: dict):
-        def _():
-            res = self.sb.table("tickets").update(payload).eq("message_id", message_id).execute()
-            return res.data[0] if res.data else None
-        return await self._run(_)
+        res = await self._execute(self.sb.table("tickets").update(payload).eq("message_id", message_id))
+        row = res.data[0] if res.data else None
+        if row and _HISTORY_FIELDS & payload.keys():
+            self._invalidate_user_context(row["guild_id"], row["creator_id"])
+        return row
+
+    # Compare-and-set: returns None when the ticket is no longer in from_status
+    # (or does not satisfy match), so concurrent clicks cannot both win.
+    async def transition_ticket(self, message_id: str, from_status: str, payload: dict, match: dict | None = None):
+        q = self.sb.table("tickets").update(payload).eq("message_id", message_id).eq("status", from_status)
+        for column, value in (match or {}).items():
+            q = q.eq(column, value)
+        res = await self._execute(q)
+        row = res.data[0] if res.data else None
+        if row and _HISTORY_FIELDS & payload.keys():
+            self._invalidate_user_context(row["guild_id"], row["creator_id"])
+        return row
+
+    async def apply_ticket_activity(self, updates: list[dict]):
+        res = await self._execute(self.sb.rpc("apply_ticket_activity", {"p_updates": updates}))
+        return res.data or []
+
+    async def archive_ticket_messages(self, rows: list[dict], session_start: int = 0):
+        await self._execute(self.sb.rpc("archive_ticket_messages", {"p_rows": rows, "p_session_start": session_start}))
+
+    async def iter_ticket_messages(self, channel_id: str, through: int, page_size: int = 1000):
+        last_id = 0
+        while True:
+            res = await self._execute(
+                self.sb.table("ticket_messages")
+                .select("*")
+                .eq("channel_id", channel_id)
+                .gt("message_id", last_id)
+                .lte("message_id", through)
+                .order("message_id")
+                .limit(page_size)
+            )
+            page = res.data or []
+            for row in page:
+                yield row
+            if len(page) < page_size:
+                return
+            last_id = page[-1]["message_id"]
 
     async def get_ticket_by_message(self, message_id: str):
-        def _():
-            res = self.sb.table("tickets").select("*").eq("message_id", message_id).execute()
-            return res.data[0] if res.data else None
-        return await self._run(_)
+        res = await self._execute(self.sb.table("tickets").select("*").eq("message_id", message_id))
+        return res.data[0] if res.data else None
 
     async def get_ticket_by_channel(self, channel_id: str):
-        def _():
-            res = self.sb.table("tickets").select("*").eq("channel_id", channel_id).execute()
-            return res.data[0] if res.data else None
-        return await self._run(_)
+        res = await self._execute(self.sb.table("tickets").select("*").eq("channel_id", channel_id))
+        return res.data[0] if res.data else None
+
+    async def list_active_tickets(self, page_size: int = 1000):
+        rows = []
+        last_id = 0
+        while True:
+            res = await self._execute(
+                self.sb.table("tickets")
+                .select("*")
+                .in_("status", ["OPEN", "CLAIMED"])
+                .gt("id", last_id)
+                .order("id")
+                .limit(page_size)
+            )
+            page = res.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            last_id = page[-1]["id"]
 
     async def list_links(self, ticket_id: int):
-        def _():
-            res = self.sb.table("ticket_links").select("*").eq("ticket_id", ticket_id).execute()
-            return res.data or []
-        return await self._run(_)
+        res = await self._execute(self.sb.table("ticket_links").select("*").eq("ticket_id", ticket_id))
+        return res.data or []
 
     async def add_link(self, guild_id: str, ticket_id: int, linked_ticket_id: int, created_by: str):
-        def _():
-            res = self.sb.table("ticket_links").insert({
-                "guild_id": guild_id,
-                "ticket_id": ticket_id,
-                "linked_ticket_id": linked_ticket_id,
-                "created_by": created_by,
-            }).execute()
-            return res.data[0] if res.data else None
-        return await self._run(_)
+        res = await self._execute(self.sb.table("ticket_links").insert({
+            "guild_id": guild_id,
+            "ticket_id": ticket_id,
+            "linked_ticket_id": linked_ticket_id,
+            "created_by": created_by,
+        }))
+        self._context_version += 1
+        self.context_cache.invalidate(ticket_id)
+        return res.data[0] if res.data else None
+
+    async def add_links(self, guild_id: str, pairs: list[tuple[int, int]], created_by: str):
+        rows = [{"guild_id": guild_id, "ticket_id": a, "linked_ticket_id": b, "created_by": created_by} for a, b in pairs]
+        res = await self._execute(self.sb.table("ticket_links").insert(rows))
+        self._context_version += 1
+        for a, _ in pairs:
+            self.context_cache.invalidate(a)
+        return res.data or []
+
+    async def list_ticket_signatures(self, guild_id: str, created_since: str | None = None, page_size: int = 1000):
+        rows = []
+        last_id = 0
+        while True:
+            q = self.sb.table("tickets").select("id,creator_id,minhash").eq("guild_id", guild_id).not_.is_("minhash", "null").gt("id", last_id)
+            if created_since:
+                q = q.gte("created_at", created_since)
+            res = await self._execute(q.order("id").limit(page_size))
+            page = res.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            last_id = page[-1]["id"]
 
     async def mod_summary(self, guild_id: str, user_id: str):
-        def _():
-            warn = self.sb.table("mod_actions").select("id", count="exact").eq("guild_id", guild_id).eq("user_id", user_id).eq("action_type", "WARN").execute()
-            mute = self.sb.table("mod_actions").select("id", count="exact").eq("guild_id", guild_id).eq("user_id", user_id).eq("action_type", "MUTE").execute()
-            ban = self.sb.table("mod_actions").select("id", count="exact").eq("guild_id", guild_id).eq("user_id", user_id).eq("action_type", "BAN").execute()
-            return {
-                "warnings": warn.count or 0,
-                "mutes": mute.count or 0,
-                "bans": ban.count or 0,
-            }
-        return await self._run(_)
+        res = await self._execute(self.sb.rpc("mod_action_summary", {"p_guild_id": guild_id, "p_user_id": user_id}))
+        row = res.data[0] if res.data else {}
+        return {
+            "warnings": row.get("warnings") or 0,
+            "mutes": row.get("mutes") or 0,
+            "bans": row.get("bans") or 0,
+        }
 
     async def create_mod_action(self, payload: dict):
-        def _():
-            res = self.sb.table("mod_actions").insert(payload).execute()
-            return res.data[0] if res.data else None
-        return await self._run(_)
+        res = await self._execute(self.sb.table("mod_actions").insert(payload))
+        self._invalidate_user_context(payload.get("guild_id"), payload.get("user_id"))
+        return res.data[0] if res.data else None
+
+    async def create_mod_actions(self, rows: list[dict]):
+        res = await self._execute(self.sb.table("mod_actions").insert(rows))
+        for guild_id, user_id in {(row["guild_id"], row["user_id"]) for row in rows}:
+            self._invalidate_user_context(guild_id, user_id)
+        return res.data or []
 
     async def user_ticket_stats(self, guild_id: str, user_id: str):
-        def _():
-            created = self.sb.table("tickets").select("id", count="exact").eq("guild_id", guild_id).eq("creator_id", user_id).execute()
-            claimed = self.sb.table("tickets").select("id", count="exact").eq("guild_id", guild_id).eq("claimed_by", user_id).execute()
-            closed = self.sb.table("tickets").select("id", count="exact").eq("guild_id", guild_id).eq("closed_by", user_id).execute()
-            return {
-                "created": created.count or 0,
-                "claimed": claimed.count or 0,
-                "closed": closed.count or 0,
-            }
-        return await self._run(_)
+        res = await self._execute(self.sb.rpc("user_ticket_stats", {"p_guild_id": guild_id, "p_user_id": user_id}))
+        row = res.data[0] if res.data else {}
+        return {
+            "created": row.get("created") or 0,
+            "claimed": row.get("claimed") or 0,
+            "closed": row.get("closed") or 0,
+        }
+
+    async def multi_count(self, table: str, filters: dict, counts: dict[str, dict]):
+        res = await self._execute(self.sb.rpc("multi_count", {"p_table": table, "p_filters": filters, "p_counts": counts}))
+        data = res.data or {}
+        return {name: int(data.get(name) or 0) for name in counts}
 
     async def user_ticket_history(self, guild_id: str, user_id: str):
-        def _():
-            res = self.sb.table("tickets").select("created_at, closed_at").eq("guild_id", guild_id).eq("creator_id", user_id).order("created_at", desc=True).execute()
-            rows = res.data or []
-            last = rows[0]["closed_at"] if rows else None
-            if not last and rows:
-                last = rows[0]["created_at"]
-            return {"total": len(rows), "last": last}
-        return await self._run(_)
+        res = await self._execute(self.sb.rpc("user_ticket_history", {"p_guild_id": guild_id, "p_user_id": user_id}))
+        row = res.data[0] if res.data else {}
+        return {"total": row.get("total") or 0, "last": row.get("last")}
 
     async def rolling_tickets_by_creator(self, guild_id: str, user_id: str, since_iso: str):
-        def _():
-            res = self.sb.table("tickets").select("created_at").eq("guild_id", guild_id).eq("creator_id", user_id).gte("created_at", since_iso).order("created_at").execute()
-            return res.data or []
-        return await self._run(_)
+        res = await self._execute(self.sb.table("tickets").select("created_at").eq("guild_id", guild_id).eq("creator_id", user_id).gte("created_at", since_iso).order("created_at"))
+        return res.data or []
+
+    async def list_tickets_since(self, since_iso: str, after_id: int = 0, page_size: int = 1000):
+        rows = []
+        while True:
+            res = await self._execute(
+                self.sb.table("tickets")
+                .select("id,guild_id,creator_id,created_at,query_text")
+                .gte("created_at", since_iso)
+                .gt("id", after_id)
+                .order("id")
+                .limit(page_size)
+            )
+            page = res.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            after_id = page[-1]["id"]
 
     async def count_recent_tickets(self, guild_id: str, user_id: str, since_iso: str):
-        def _():
-            res = self.sb.table("tickets").select("id", count="exact").eq("guild_id", guild_id).eq("creator_id", user_id).gte("created_at", since_iso).execute()
-            return res.count or 0
-        return await self._run(_)
+        res = await self._execute(self.sb.table("tickets").select("id", count="exact").eq("guild_id", guild_id).eq("creator_id", user_id).gte("created_at", since_iso))
+        return res.count or 0
+
+    async def ticket_context(self, ticket: dict):
+        cached = self.context_cache.get(ticket["id"])
+        if cached is not MISSING:
+            return cached
+        version = self._context_version
+        mod, history, links = await asyncio.gather(
+            self.mod_summary(ticket["guild_id"], ticket["creator_id"]),
+            self.user_ticket_history(ticket["guild_id"], ticket["creator_id"]),
+            self.list_links(ticket["id"]),
+        )
+        context = {
+            "guild_id": str(ticket["guild_id"]),
+            "creator_id": str(ticket["creator_id"]),
+            "mod": mod,
+            "history": history,
+            "links": links,
+        }
+        # A write that landed while we were reading may have been missed by the snapshot.
+        if version == self._context_version:
+            self.context_cache.set(ticket["id"], context)
+        return context
+
+    def _invalidate_user_context(self, guild_id, user_id):
+        self._context_version += 1
+        guild_id, user_id = str(guild_id), str(user_id)
+        self.context_cache.invalidate_where(lambda _, v: v["guild_id"] == guild_id and v["creator_id"] == user_id)
@@ -1,57 +1,174 @@
+import asyncio
+import io
+import json
+from urllib.parse import quote
+
 import aiohttp
 
+from .ratelimit import PRIORITY_BACKGROUND, PRIORITY_DEFAULT, PRIORITY_INTERACTION, RateLimiter
+
 
 class DiscordRest:
-    def __init__(self, token: str):
+    def __init__(self, token: str, limit: int = 100, limit_per_host: int = 30, keepalive_timeout: float = 60.0, base: str = "https://discord.com/api/v10", max_retries: int = 3):
         self.token = token
-        self.base = "https://discord.com/api/v10"
+        self.base = base
+        self.max_retries = max_retries
+        self.limiter = RateLimiter()
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self._session: aiohttp.ClientSession | None = None
+        self._metrics = {"requests": 0, "connections_created": 0, "connections_reused": 0}
 
     def _headers(self):
         return {"Authorization": f"Bot {self.token}"}
 
+    async def start(self):
+        if self._session is None or self._session.closed:
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._on_connection_create)
+            trace.on_connection_reuseconn.append(self._on_connection_reuse)
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=[trace])
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _on_connection_create(self, session, ctx, params):
+        self._metrics["connections_created"] += 1
+
+    async def _on_connection_reuse(self, session, ctx, params):
+        self._metrics["connections_reused"] += 1
+
+    def stats(self):
+        created = self._metrics["connections_created"]
+        reused = self._metrics["connections_reused"]
+        return {
+            **self._metrics,
+            "reuse_ratio": round(reused / (created + reused), 3) if created + reused else 0.0,
+            "open": bool(self._session and not self._session.closed),
+            "ratelimit": self.limiter.stats(),
+        }
+
+    async def _request(self, method: str, path: str, label: str, parse: bool = False, priority: int = PRIORITY_DEFAULT, form=None, reason: str | None = None, **kwargs):
+        session = await self.start()
+        headers = self._headers()
+        if reason:
+            headers["X-Audit-Log-Reason"] = quote(reason)
+        for _ in range(self.max_retries + 1):
+            if form:
+                kwargs["data"] = form()
+            async with self.limiter.acquire(method, path, priority) as slot:
+                self._metrics["requests"] += 1
+                async with session.request(method, f"{self.base}{path}", headers=headers, **kwargs) as resp:
+                    slot.update(resp.headers)
+                    if resp.status == 429:
+                        body = await resp.json(content_type=None) if resp.content_type == "application/json" else {}
+                        retry_after = float(body.get("retry_after") or resp.headers.get("Retry-After") or 1)
+                        slot.rate_limited(retry_after, bool(body.get("global")) or resp.headers.get("X-RateLimit-Scope") == "global")
+                        continue
+                    if resp.status >= 400:
+                        text = await resp.text()
+                        raise RuntimeError(f"Discord {label} failed: {resp.status} {text}")
+                    if parse:
+                        return await resp.json()
+                    return None
+        raise RuntimeError(f"Discord {label} failed: still rate limited after {self.max_retries} retries")
+
     async def post_interaction_response(self, interaction_id: int, token: str, payload: dict):
-        url = f"{self.base}/interactions/{interaction_id}/{token}/callback"
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload, headers=self._headers()) as resp:
-                if resp.status >= 400:
-                    text = await resp.text()
-                    raise RuntimeError(f"Discord interaction response failed: {resp.status} {text}")
+        path = f"/interactions/{interaction_id}/{token}/callback"
+        await self._request("POST", path, "interaction response", priority=PRIORITY_INTERACTION, json=payload)
 
     async def edit_original_response(self, app_id: int, token: str, payload: dict):
-        url = f"{self.base}/webhooks/{app_id}/{token}/messages/@original"
-        async with aiohttp.ClientSession() as session:
-            async with session.patch(url, json=payload, headers=self._headers()) as resp:
-                if resp.status >= 400:
-                    text = await resp.text()
-                    raise RuntimeError(f"Discord edit original failed: {resp.status} {text}")
+        path = f"/webhooks/{app_id}/{token}/messages/@original"
+        await self._request("PATCH", path, "edit original", priority=PRIORITY_INTERACTION, json=payload)
+
+    async def create_followup_message(self, app_id: int, token: str, payload: dict):
+        path = f"/webhooks/{app_id}/{token}"
+        return await self._request("POST", path, "followup message", parse=True, priority=PRIORITY_INTERACTION, json=payload)
 
     async def edit_original_response_with_files(self, app_id: int, token: str, payload: dict, files: list[tuple[str, bytes]]):
-        url = f"{self.base}/webhooks/{app_id}/{token}/messages/@original"
-        form = aiohttp.FormData()
-        import json
-        form.add_field("payload_json", json.dumps(payload), content_type="application/json")
-        for idx, (name, data) in enumerate(files):
-            form.add_field(f"files[{idx}]", data, filename=name, content_type="application/octet-stream")
-        async with aiohttp.ClientSession() as session:
-            async with session.patch(url, data=form, headers={"Authorization": f"Bot {self.token}"}) as resp:
-                if resp.status >= 400:
-                    text = await resp.text()
-                    raise RuntimeError(f"Discord edit original with files failed: {resp.status} {text}")
+        path = f"/webhooks/{app_id}/{token}/messages/@original"
+        await self._request("PATCH", path, "edit original with files", priority=PRIORITY_INTERACTION, form=_multipart(payload, files))
 
     async def send_channel_message(self, channel_id: int, payload: dict):
-        url = f"{self.base}/channels/{channel_id}/messages"
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload, headers=self._headers()) as resp:
-                if resp.status >= 400:
-                    text = await resp.text()
-                    raise RuntimeError(f"Discord send message failed: {resp.status} {text}")
-                return await resp.json()
+        path = f"/channels/{channel_id}/messages"
+        return await self._request("POST", path, "send message", parse=True, json=payload)
 
     async def edit_message(self, channel_id: int, message_id: int, payload: dict):
-        url = f"{self.base}/channels/{channel_id}/messages/{message_id}"
-        async with aiohttp.ClientSession() as session:
-            async with session.patch(url, json=payload, headers=self._headers()) as resp:
-                if resp.status >= 400:
-                    text = await resp.text()
-                    raise RuntimeError(f"Discord edit message failed: {resp.status} {text}")
-                return await resp.json()
+        path = f"/channels/{channel_id}/messages/{message_id}"
+        return await self._request("PATCH", path, "edit message", parse=True, priority=PRIORITY_BACKGROUND, json=payload)
+
+    async def send_channel_message_with_files(self, channel_id: int, payload: dict, files: list[tuple[str, bytes]]):
+        path = f"/channels/{channel_id}/messages"
+        return await self._request("POST", path, "send message with files", parse=True, form=_multipart(payload, files))
+
+    async def iter_channel_messages(self, channel_id: int, after: str = "0", page_size: int = 100):
+        # Oldest first; each page comes back newest first, so it is reversed.
+        while True:
+            path = f"/channels/{channel_id}/messages"
+            page = await self._request("GET", path, "list messages", parse=True, priority=PRIORITY_BACKGROUND, params={"after": after, "limit": page_size})
+            if not page:
+                return
+            page.sort(key=lambda m: int(m["id"]))
+            for msg in page:
+                yield msg
+            after = page[-1]["id"]
+            if len(page) < page_size:
+                return
+
+    async def get_guild(self, guild_id: int):
+        return await self._request("GET", f"/guilds/{guild_id}", "get guild", parse=True)
+
+    async def create_guild_channel(self, guild_id: int, payload: dict, reason: str | None = None):
+        return await self._request("POST", f"/guilds/{guild_id}/channels", "create channel", parse=True, reason=reason, json=payload)
+
+    async def delete_channel(self, channel_id: int, reason: str | None = None):
+        await self._request("DELETE", f"/channels/{channel_id}", "delete channel", reason=reason)
+
+    async def edit_channel_permissions(self, channel_id: int, overwrite_id: int, payload: dict):
+        await self._request("PUT", f"/channels/{channel_id}/permissions/{overwrite_id}", "edit permissions", json=payload)
+
+    async def timeout_member(self, guild_id: int, user_id: int, until_iso: str, reason: str | None = None):
+        path = f"/guilds/{guild_id}/members/{user_id}"
+        return await self._request("PATCH", path, "timeout member", parse=True, reason=reason, json={"communication_disabled_until": until_iso})
+
+
+class _FilePayload(aiohttp.payload.IOBasePayload):
+    # Streams a seekable file without closing it, so a retried upload can rewind it.
+    def __init__(self, value, *args, **kwargs):
+        self._size = value.seek(0, io.SEEK_END)
+        value.seek(0)
+        super().__init__(value, *args, **kwargs)
+
+    @property
+    def size(self):
+        return self._size
+
+    async def write(self, writer):
+        loop = asyncio.get_running_loop()
+        chunk = await loop.run_in_executor(None, self._value.read, 2**16)
+        while chunk:
+            await writer.write(chunk)
+            chunk = await loop.run_in_executor(None, self._value.read, 2**16)
+
+
+def _multipart(payload: dict, files: list[tuple[str, bytes]]):
+    # files hold bytes or seekable file objects; file objects are streamed, never read whole.
+    def build_form():
+        form = aiohttp.FormData()
+        form.add_field("payload_json", json.dumps(payload), content_type="application/json")
+        for idx, (name, data) in enumerate(files):
+            if hasattr(data, "read"):
+                data = _FilePayload(data, filename=name, content_type="application/octet-stream")
+            form.add_field(f"files[{idx}]", data, filename=name, content_type="application/octet-stream")
+        return form
+    return build_form
@@ -0,0 +1,175 @@
+import asyncio
+import base64
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 5
+
+_rng = np.random.default_rng(0x5EED)
+# Multiply-shift hashing: odd 64-bit multipliers, keep the high 32 bits.
+_A = (_rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) | np.uint64(1))[:, None]
+_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)[:, None]
+
+
+def signature(text: str | None):
+    # MinHash over character 5-grams of the normalized text; None for empty text.
+    norm = " ".join((text or "").lower().split())
+    if not norm:
+        return None
+    grams = {norm[i:i + SHINGLE] for i in range(max(1, len(norm) - SHINGLE + 1))}
+    x = np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+    with np.errstate(over="ignore"):
+        hashed = (_A * x + _B) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def encode_signature(sig: np.ndarray | None):
+    return base64.b64encode(sig.astype("<u4").tobytes()).decode() if sig is not None else None
+
+
+def decode_signature(value: str | None):
+    if not value:
+        return None
+    sig = np.frombuffer(base64.b64decode(value), dtype="<u4")
+    return sig if len(sig) == NUM_PERM else None
+
+
+class GuildLSH:
+    def __init__(self):
+        self.buckets: dict[bytes, list[int]] = {}
+        self.signatures: dict[int, np.ndarray] = {}
+        self.creators: dict[int, str] = {}
+        self.synced_at: str | None = None
+
+    def __len__(self):
+        return len(self.signatures)
+
+    @staticmethod
+    def _keys(sig: np.ndarray):
+        rows = sig.reshape(BANDS, ROWS)
+        return [bytes((band,)) + rows[band].tobytes() for band in range(BANDS)]
+
+    def add(self, ticket_id: int, creator_id: str, sig: np.ndarray):
+        if ticket_id in self.signatures:
+            return
+        self.signatures[ticket_id] = sig
+        self.creators[ticket_id] = str(creator_id)
+        for key in self._keys(sig):
+            self.buckets.setdefault(key, []).append(ticket_id)
+
+    def query(self, sig: np.ndarray, threshold: float, exclude: int | None = None):
+        # 16 bands of 4 rows: pairs around 0.5 Jaccard start colliding, and each
+        # candidate is then scored on the full signature.
+        candidates = {tid for key in self._keys(sig) for tid in self.buckets.get(key, ())}
+        candidates.discard(exclude)
+        matches = []
+        for tid in candidates:
+            score = float(np.count_nonzero(self.signatures[tid] == sig)) / NUM_PERM
+            if score >= threshold:
+                matches.append({"ticket_id": tid, "creator_id": self.creators[tid], "score": round(score, 3)})
+        return sorted(matches, key=lambda m: m["score"], reverse=True)
+
+
+class DuplicateDetector:
+    def __init__(self, repo, threshold: float = 0.7, max_guilds: int = 64, sync_seconds: float = 60.0):
+        self.repo = repo
+        self.threshold = threshold
+        self.max_guilds = max_guilds
+        self.sync_seconds = sync_seconds
+        self.overlap = max(2 * sync_seconds, 60.0)
+        self._guilds: OrderedDict[str, GuildLSH] = OrderedDict()
+        self._loading: dict[str, asyncio.Task] = {}
+        self._synced: dict[str, float] = {}
+        self._syncing: set[str] = set()
+        self.loads = 0
+        self.queries = 0
+
+    def track(self, ticket: dict | None):
+        # Ticket listener: keeps loaded guilds current with tickets this process sees.
+        if not ticket:
+            return
+        index = self._guilds.get(str(ticket["guild_id"]))
+        sig = decode_signature(ticket.get("minhash"))
+        if index is not None and sig is not None:
+            index.add(ticket["id"], ticket["creator_id"], sig)
+
+    async def _index(self, guild_id: str, timeout: float):
+        index = self._guilds.get(guild_id)
+        if index is None:
+            task = self._loading.get(guild_id)
+            if task is None:
+                task = self._loading[guild_id] = asyncio.create_task(self._load(guild_id))
+                task.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.TimeoutError:
+                return None
+            except Exception as exc:
+                print(f"Duplicate index load failed for guild {guild_id}: {exc}")
+                return None
+        self._guilds.move_to_end(guild_id)
+        loop = asyncio.get_running_loop()
+        if guild_id not in self._syncing and loop.time() - self._synced.get(guild_id, 0) >= self.sync_seconds:
+            self._syncing.add(guild_id)
+            asyncio.create_task(self._sync(guild_id, index))
+        return index
+
+    async def _sync(self, guild_id: str, index: GuildLSH):
+        # Picks up tickets created by the other process; stored signatures mean no rehashing.
+        try:
+            await self._extend(guild_id, index)
+            self._synced[guild_id] = asyncio.get_running_loop().time()
+        except Exception as exc:
+            print(f"Duplicate index sync failed for guild {guild_id}: {exc}")
+        finally:
+            self._syncing.discard(guild_id)
+
+    async def _extend(self, guild_id: str, index: GuildLSH):
+        # Ids are reserved before the insert commits, so an id cursor would skip
+        # late rows; re-read a trailing created_at window instead (add skips ids
+        # already indexed).
+        started = datetime.utcnow()
+        since = index.synced_at and (datetime.fromisoformat(index.synced_at) - timedelta(seconds=self.overlap)).isoformat()
+        for row in await self.repo.list_ticket_signatures(guild_id, since):
+            sig = decode_signature(row["minhash"])
+            if sig is not None:
+                index.add(row["id"], row["creator_id"], sig)
+        index.synced_at = started.isoformat()
+
+    async def _load(self, guild_id: str):
+        index = GuildLSH()
+        await self._extend(guild_id, index)
+        self._guilds[guild_id] = index
+        self._synced[guild_id] = asyncio.get_running_loop().time()
+        while len(self._guilds) > self.max_guilds:
+            evicted, _ = self._guilds.popitem(last=False)
+            self._synced.pop(evicted, None)
+        self.loads += 1
+        return index
+
+    async def find(self, ticket: dict, timeout: float = 1.0):
+        # Query only: the ticket joins the index through track once its row exists.
+        sig = decode_signature(ticket.get("minhash"))
+        if sig is None or self.threshold > 1:
+            return []
+        index = await self._index(str(ticket["guild_id"]), timeout)
+        if index is None:
+            return []
+        self.queries += 1
+        return index.query(sig, self.threshold, ticket["id"])
+
+    def stats(self):
+        return {
+            "threshold": self.threshold,
+            "guilds": len(self._guilds),
+            "signatures": sum(len(index) for index in self._guilds.values()),
+            "buckets": sum(len(index.buckets) for index in self._guilds.values()),
+            "loads": self.loads,
+            "queries": self.queries,
+        }
@@ -0,0 +1,827 @@
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any
+
+from nacl.exceptions import BadSignatureError
+from nacl.signing import VerifyKey
+
+from .analysis import analyze_priority, suggestions_from_text
+from .cache import MISSING, TTLCache
+from .chart_pool import ChartRenderer
+from .charts import build_daily_series
+from .duplicates import DuplicateDetector, encode_signature, signature
+from .components import COMPONENTS_V2_FLAG, container, separator, text_display
+from .mod_counters import ModActionCounters
+from .notice import build_notice
+from .panels import render_open_panel, render_settings_panel
+from .render import render_ticket_message
+from .render_queue import TicketRenderQueue
+from .router import DEFER_REPLY, DEFER_UPDATE, InteractionRouter, LatencyHistogram
+from .similar import SimilarTickets
+from .ticket_signals import TicketSignals
+from .transcript import build_transcript
+from .transcript_archive import archive_row, message_from_row
+from .transcript_queue import TranscriptQueue
+
+PING = 1
+APPLICATION_COMMAND = 2
+MESSAGE_COMPONENT = 3
+MODAL_SUBMIT = 5
+
+EPHEMERAL_FLAG = 1 << 6
+
+PERM_ADMINISTRATOR = 1 << 3
+PERM_MANAGE_GUILD = 1 << 5
+PERM_VIEW_CHANNEL = 1 << 10
+PERM_SEND_MESSAGES = 1 << 11
+PERM_ATTACH_FILES = 1 << 15
+PERM_READ_MESSAGE_HISTORY = 1 << 16
+TICKET_READ_PERMS = PERM_VIEW_CHANNEL | PERM_READ_MESSAGE_HISTORY | PERM_ATTACH_FILES
+TICKET_MEMBER_PERMS = TICKET_READ_PERMS | PERM_SEND_MESSAGES
+
+
+def verify_signature(public_key: str, signature: str, timestamp: str, body: bytes, max_age: float = 300):
+    try:
+        # A validly signed request is only accepted for a few minutes, so it cannot be replayed later.
+        if abs(time.time() - int(timestamp)) > max_age:
+            return False
+        VerifyKey(bytes.fromhex(public_key)).verify(timestamp.encode() + body, bytes.fromhex(signature))
+        return True
+    except (BadSignatureError, ValueError, TypeError):
+        return False
+
+
+def with_defaults(settings: dict | None):
+    base = settings or {}
+    return {
+        **base,
+        "warn_threshold": base.get("warn_threshold", 3),
+        "warn_timeout_minutes": base.get("warn_timeout_minutes", 10),
+        "enable_smart_replies": base.get("enable_smart_replies", True),
+        "enable_ai_suggestions": base.get("enable_ai_suggestions", True),
+        "enable_auto_priority": base.get("enable_auto_priority", True),
+    }
+
+
+def display_name(user: dict):
+    name = user.get("username") or str(user.get("id"))
+    discriminator = user.get("discriminator")
+    return f"{name}#{discriminator}" if discriminator and discriminator != "0" else name
+
+
+def modal_values(data: dict):
+    return {c["custom_id"]: c["value"] for row in data.get("components", []) for c in row.get("components", [])}
+
+
+@dataclass
+class InteractionContext:
+    id: str
+    token: str
+    type: int
+    application_id: str
+    guild_id: str | None
+    channel_id: str | None
+    user_id: str
+    user_name: str
+    roles: list[str]
+    permissions: int
+    data: dict
+    message_id: str | None = None
+    owner_id: str | None = None
+    responded: bool = False
+    ack_type: int | None = None
+    first_response_at: float | None = None
+    initial: Any = field(default=None, repr=False)
+    ack: Any = field(default=None, repr=False)
+    delivered: Any = field(default=None, repr=False)
+
+    @classmethod
+    def from_payload(cls, payload: dict):
+        member = payload.get("member") or {}
+        user = member.get("user") or payload.get("user") or {}
+        channel = payload.get("channel") or {}
+        return cls(
+            id=str(payload["id"]),
+            token=payload["token"],
+            type=payload["type"],
+            application_id=str(payload.get("application_id")),
+            guild_id=payload.get("guild_id"),
+            channel_id=payload.get("channel_id") or channel.get("id"),
+            user_id=str(user.get("id")),
+            user_name=display_name(user),
+            roles=[str(r) for r in member.get("roles", [])],
+            permissions=int(member.get("permissions") or 0),
+            data=payload.get("data") or {},
+            message_id=(payload.get("message") or {}).get("id"),
+        )
+
+    @classmethod
+    def from_discord(cls, interaction, initial=None):
+        user = interaction.user
+        permissions = getattr(user, "guild_permissions", None)
+        return cls(
+            id=str(interaction.id),
+            token=interaction.token,
+            type=interaction.type.value,
+            application_id=str(interaction.application_id),
+            guild_id=str(interaction.guild_id) if interaction.guild_id else None,
+            channel_id=str(interaction.channel_id) if interaction.channel_id else None,
+            user_id=str(user.id),
+            user_name=str(user),
+            roles=[str(r.id) for r in getattr(user, "roles", [])],
+            permissions=permissions.value if permissions else 0,
+            data=interaction.data or {},
+            message_id=str(interaction.message.id) if interaction.message else None,
+            owner_id=str(interaction.guild.owner_id) if interaction.guild and interaction.guild.owner_id else None,
+            initial=initial,
+        )
+
+    @property
+    def is_owner(self):
+        return bool(self.owner_id) and self.owner_id == self.user_id
+
+    @property
+    def is_admin_or_owner(self):
+        return self.is_owner or bool(self.permissions & (PERM_MANAGE_GUILD | PERM_ADMINISTRATOR))
+
+    def has_staff_role(self, staff_role_id: str | None):
+        if self.is_owner:
+            return True
+        if not staff_role_id or not self.guild_id:
+            return False
+        return str(staff_role_id) in self.roles
+
+
+class InteractionHandlers:
+    def __init__(self, config, rest, repo):
+        self.config = config
+        self.rest = rest
+        self.repo = repo
+        self.renders = TicketRenderQueue(self.render_ticket_payload, rest.edit_message, config.render_debounce_seconds)
+        self.charts = ChartRenderer(config.chart_workers, config.chart_cache_mb * 1024 * 1024, config.chart_renderer)
+        self.router = InteractionRouter(config.interaction_defer_budget_ms / 1000)
+        self.signals = TicketSignals(repo, sync_seconds=config.signal_sync_seconds)
+        self.transcripts = TranscriptQueue(self.post_transcript, config.transcript_concurrency, config.transcript_guild_concurrency)
+        self.similar = SimilarTickets(repo, config.similar_tickets)
+        self.duplicates = DuplicateDetector(repo, config.duplicate_threshold)
+        self.mod_counts = ModActionCounters(repo, config.activity_flush_seconds)
+        self.ticket_listeners: list = [self.similar.track, self.duplicates.track]
+        self.create_stages: defaultdict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self._owners = TTLCache(4096, ttl=3600)
+        for kind, key, handler, defer in (
+            (APPLICATION_COMMAND, "ticket create", self.ticket_create, DEFER_REPLY),
+            (APPLICATION_COMMAND, "ticket setup", self.ticket_setup, DEFER_REPLY),
+            (APPLICATION_COMMAND, "ticket panel", self.ticket_panel, None),
+            (APPLICATION_COMMAND, "ticket panelset", self.ticket_panelset, DEFER_REPLY),
+            (APPLICATION_COMMAND, "info", self.info, DEFER_REPLY),
+            (APPLICATION_COMMAND, "mod log", self.mod_log, DEFER_REPLY),
+            (APPLICATION_COMMAND, "mod config", self.mod_config, DEFER_REPLY),
+            (MESSAGE_COMPONENT, r"ticket:category:add", self.category_add, None),
+            (MESSAGE_COMPONENT, r"ticket:panel:page(?::(?P<page>\d+))?", self.panel_page, DEFER_UPDATE),
+            (MESSAGE_COMPONENT, r"ticket:slots(?::\d+)?", self.slots, DEFER_UPDATE),
+            (MESSAGE_COMPONENT, r"ticket:settings:(?P<field>warn|timeout)", self.settings_prompt, None),
+            (MESSAGE_COMPONENT, r"ticket:toggle:(?P<flag>\w+)", self.toggle, DEFER_UPDATE),
+            (MESSAGE_COMPONENT, r"ticket:open(?::\d+)?", self.open_prompt, None),
+            (MESSAGE_COMPONENT, r"ticket:(?P<action>claim|close|reopen)(?::\d+)?", self.transition, DEFER_REPLY),
+            (MESSAGE_COMPONENT, r"ticket:transcript(?::\d+)?", self.transcript, DEFER_REPLY),
+            (MESSAGE_COMPONENT, r"ticket:link(?::\d+)?", self.link_prompt, None),
+            (MODAL_SUBMIT, r"ticket:category:create:\w+", self.category_create, DEFER_UPDATE),
+            (MODAL_SUBMIT, r"ticket:settings:(?P<field>warn|timeout):\w+", self.settings_submit, DEFER_REPLY),
+            (MODAL_SUBMIT, r"ticket:open:create:(?P<category_id>\d+)", self.open_submit, DEFER_REPLY),
+            (MODAL_SUBMIT, r"ticket:link:create:\w+(?::(?P<ticket_id>\d+))?", self.link_submit, DEFER_REPLY),
+        ):
+            self.router.add(kind, key, handler, defer)
+
+    def _ticket_changed(self, ticket: dict | None):
+        for listener in self.ticket_listeners:
+            listener(ticket)
+
+    def _acknowledge(self, ctx: InteractionContext, body: dict):
+        ctx.responded = True
+        ctx.ack_type = body["type"]
+        ctx.ack = asyncio.ensure_future(ctx.initial(body))
+        return asyncio.shield(ctx.ack)
+
+    async def acknowledged(self, ctx: InteractionContext):
+        # Webhook calls for an interaction are only valid once Discord has the
+        # initial response; over HTTP that is when the reply has been written.
+        if ctx.ack:
+            await asyncio.shield(ctx.ack)
+        if ctx.delivered:
+            await asyncio.shield(ctx.delivered)
+
+    def mark_delivered(self, ctx: InteractionContext):
+        if ctx.delivered and not ctx.delivered.done():
+            ctx.delivered.set_result(None)
+
+    async def defer(self, ctx: InteractionContext, kind: int):
+        if ctx.responded:
+            return
+        await self._acknowledge(ctx, {"type": kind, "data": {"flags": EPHEMERAL_FLAG}} if kind == DEFER_REPLY else {"type": kind})
+
+    async def respond(self, ctx: InteractionContext, body: dict):
+        ctx.first_response_at = ctx.first_response_at or time.monotonic()
+        if not ctx.responded:
+            await self._acknowledge(ctx, body)
+            return
+        await self.acknowledged(ctx)
+        # Once acknowledged, the reply can only go through the interaction
+        # webhook. After an update-style ack the original is the component's
+        # message, so new notices become follow-ups instead of overwriting it.
+        on_message = ctx.ack_type in (DEFER_UPDATE, 7)
+        if body["type"] == 4 and on_message:
+            await self.rest.create_followup_message(ctx.application_id, ctx.token, body["data"])
+        elif body["type"] == 4 or (body["type"] == 7 and on_message):
+            await self.rest.edit_original_response(ctx.application_id, ctx.token, body["data"])
+        elif body["type"] == 7 and ctx.message_id:
+            await self.rest.edit_message(ctx.channel_id, ctx.message_id, body["data"])
+        else:
+            print(f"Interaction {ctx.id}: response type {body['type']} dropped after acknowledgement")
+
+    async def send_message(self, ctx: InteractionContext, payload: dict, ephemeral: bool = False):
+        payload["flags"] = payload.get("flags", 0) | COMPONENTS_V2_FLAG | (EPHEMERAL_FLAG if ephemeral else 0)
+        await self.respond(ctx, {"type": 4, "data": payload})
+
+    async def update_message(self, ctx: InteractionContext, payload: dict):
+        payload["flags"] = payload.get("flags", 0) | COMPONENTS_V2_FLAG
+        await self.respond(ctx, {"type": 7, "data": payload})
+
+    async def show_modal(self, ctx: InteractionContext, title: str, custom_id: str, inputs: list[dict]):
+        await self.respond(ctx, {"type": 9, "data": {"title": title, "custom_id": custom_id, "components": [{"type": 1, "components": [i]} for i in inputs]}})
+
+    async def notice(self, ctx: InteractionContext, kind: str, title: str, body: str):
+        await self.send_message(ctx, build_notice(kind, title, body), ephemeral=True)
+
+    async def resolve_owner(self, ctx: InteractionContext):
+        # HTTP payloads carry no guild object; the owner is looked up once and cached.
+        if ctx.owner_id or not ctx.guild_id:
+            return
+        owner_id = self._owners.get(ctx.guild_id)
+        if owner_id is MISSING:
+            try:
+                guild = await self.rest.get_guild(ctx.guild_id)
+                owner_id = str(guild.get("owner_id"))
+            except Exception as exc:
+                print(f"Guild owner lookup failed for {ctx.guild_id}: {exc}")
+                return
+            self._owners.set(ctx.guild_id, owner_id)
+        ctx.owner_id = owner_id
+
+    async def serve_http(self, ctx: InteractionContext, budget: float = 2.5):
+        # Discord needs the HTTP reply within 3s. Whatever is sent first (the
+        # handler's answer or the router's deferral) becomes the reply; the
+        # hard budget only covers routes the router may not defer.
+        loop = asyncio.get_running_loop()
+        first = loop.create_future()
+
+        async def initial(body: dict):
+            if not first.done():
+                first.set_result(body)
+
+        def report(done: asyncio.Task):
+            if not done.cancelled() and done.exception():
+                print(f"Interaction {ctx.id} failed: {done.exception()}")
+
+        ctx.initial = initial
+        # Set by the web route once the reply is written (mark_delivered); the
+        # fallback covers a reply that never gets out, after which Discord has
+        # given up on the interaction anyway.
+        ctx.delivered = loop.create_future()
+        loop.call_later(5.0, self.mark_delivered, ctx)
+        task = asyncio.create_task(self.dispatch(ctx))
+        task.add_done_callback(report)
+        await asyncio.wait({first, task}, timeout=budget, return_when=asyncio.FIRST_COMPLETED)
+        if first.done():
+            return first.result()
+        kind = DEFER_UPDATE if ctx.type == MESSAGE_COMPONENT else DEFER_REPLY
+        ctx.responded = True
+        ctx.ack_type = kind
+        return {"type": kind, "data": {"flags": EPHEMERAL_FLAG}} if kind == DEFER_REPLY else {"type": kind}
+
+    async def dispatch(self, ctx: InteractionContext):
+        if ctx.type == APPLICATION_COMMAND:
+            key = ctx.data.get("name")
+            options = ctx.data.get("options") or []
+            if key in ("ticket", "mod") and options:
+                key = f"{key} {options[0]['name']}"
+                options = options[0].get("options") or []
+            route, _ = self.router.match(ctx.type, key)
+            params = {o["name"]: o.get("value") for o in options}
+        else:
+            route, params = self.router.match(ctx.type, ctx.data.get("custom_id", ""))
+        if not route:
+            return
+        await self.resolve_owner(ctx)
+        await self.router.run(ctx, route, params, self.defer)
+
+    async def related_tickets(self, ticket: dict, duplicates: list | None = None):
+        if duplicates is None:
+            duplicates, similar = await asyncio.gather(self.duplicates.find(ticket), self.similar.similar(ticket))
+        else:
+            similar = await self.similar.similar(ticket)
+        related = [{**d, "kind": "duplicate"} for d in duplicates]
+        seen = {d["ticket_id"] for d in related}
+        return related + [s for s in similar if s["ticket_id"] not in seen]
+
+    async def build_context(self, ticket: dict, settings: dict, cached: dict | None = None, related: list | None = None):
+        cached = cached or await self.repo.ticket_context(ticket)
+        mod, history, links = cached["mod"], cached["history"], cached["links"]
+        linked = [l["linked_ticket_id"] for l in links]
+        if settings.get("enable_ai_suggestions"):
+            related = [r for r in (await self.related_tickets(ticket) if related is None else related) if r["ticket_id"] not in linked]
+        return {
+            "moderation": {
+                "warnings": mod["warnings"],
+                "mutes": mod["mutes"],
+                "bans": mod["bans"],
+                "previous": history["total"],
+                "last_support": history["last"],
+            },
+            "links": linked,
+            "suggestions": suggestions_from_text(ticket["query_text"], settings) if settings.get("enable_ai_suggestions") else [],
+            "similar": related or [],
+        }
+
+    async def render_ticket_payload(self, ticket: dict, settings: dict | None = None, cached: dict | None = None, related: list | None = None):
+        settings = settings or await self.repo.get_guild_settings(str(ticket["guild_id"])) or {}
+        context = await self.build_context(ticket, with_defaults(settings), cached, related)
+        return render_ticket_message(ticket, f"<@{ticket['creator_id']}>", settings.get("timezone") or self.config.timezone, context["moderation"], context["links"], context["suggestions"], context["similar"])
+
+    async def create_ticket_channel(self, ctx: InteractionContext, settings: dict):
+        overwrites = [
+            {"id": ctx.guild_id, "type": 0, "allow": "0", "deny": str(PERM_VIEW_CHANNEL)},
+            {"id": str(settings["staff_role_id"]), "type": 0, "allow": str(TICKET_MEMBER_PERMS), "deny": "0"},
+            {"id": ctx.user_id, "type": 1, "allow": str(TICKET_MEMBER_PERMS), "deny": "0"},
+        ]
+        return await self.rest.create_guild_channel(ctx.guild_id, {
+            "name": f"ticket-{int(datetime.utcnow().timestamp())}",
+            "type": 0,
+            "parent_id": str(settings["ticket_parent_channel_id"]),
+            "topic": f"SwiftTicket for {ctx.user_name}",
+            "permission_overwrites": overwrites,
+        }, reason="Ticket created")
+
+    async def set_creator_can_send(self, ticket: dict, can_send: bool):
+        allow = TICKET_MEMBER_PERMS if can_send else TICKET_READ_PERMS
+        deny = 0 if can_send else PERM_SEND_MESSAGES
+        await self.rest.edit_channel_permissions(ticket["channel_id"], ticket["creator_id"], {"type": 1, "allow": str(allow), "deny": str(deny)})
+
+    async def _timed(self, stage: str, aw):
+        started = time.perf_counter()
+        try:
+            return await aw
+        finally:
+            self.create_stages[stage].observe((time.perf_counter() - started) * 1000)
+
+    async def ticket_priority(self, ctx: InteractionContext, reason: str, normalized: dict):
+        if not normalized["enable_auto_priority"]:
+            return {"priority": "NORMAL", "reason": None}
+        self.signals.start()
+        recent = self.signals.recent_tickets(ctx.guild_id, ctx.user_id)
+        if recent is None:
+            recent = await self.repo.count_recent_tickets(ctx.guild_id, ctx.user_id, (datetime.utcnow() - timedelta(hours=24)).isoformat())
+        return analyze_priority(reason, recent, self.signals.repeated_reports(ctx.guild_id, reason) or 0, normalized)
+
+    async def create_ticket(self, ctx: InteractionContext, settings: dict, reason: str, category: dict | None):
+        # Everything that does not need the channel (id reservation, priority,
+        # creator context, duplicate lookup) runs while Discord creates it. The
+        # reserved id lets the message go out first, so the row is inserted once
+        # with its message_id instead of insert + update.
+        started = time.perf_counter()
+        creating = asyncio.create_task(self._timed("notice", self.notice(ctx, "info", "Creating", "Opening your ticket...")))
+        if not settings.get("ticket_parent_channel_id") or not settings.get("staff_role_id"):
+            await creating
+            await self.notice(ctx, "error", "Not configured", "Ticket parent or staff role is missing. Run /ticket setup.")
+            return
+        normalized = with_defaults(settings)
+        ticket = {
+            "guild_id": ctx.guild_id,
+            "creator_id": ctx.user_id,
+            "query_text": reason,
+            "status": "OPEN",
+            "category_id": category["id"] if category else None,
+            "category_name": category["name"] if category else None,
+            "category_description": category.get("description") if category else None,
+            "minhash": encode_signature(signature(reason)),
+        }
+
+        async def reserve_and_relate():
+            ticket["id"] = await self._timed("reserve", self.repo.next_ticket_id())
+            duplicates = await self.duplicates.find(ticket)
+            related = await self.related_tickets(ticket, duplicates) if normalized["enable_ai_suggestions"] else None
+            return duplicates, related
+
+        channel_task = asyncio.create_task(self._timed("channel", self.create_ticket_channel(ctx, settings)))
+        prefetch = asyncio.gather(
+            self._timed("priority", self.ticket_priority(ctx, reason, normalized)),
+            self._timed("context", asyncio.gather(self.repo.mod_summary(ctx.guild_id, ctx.user_id), self.repo.user_ticket_history(ctx.guild_id, ctx.user_id))),
+            self._timed("related", reserve_and_relate()),
+        )
+        try:
+            channel = await channel_task
+        except Exception as exc:
+            await asyncio.gather(prefetch, creating, return_exceptions=True)
+            await self.notice(ctx, "error", "Setup error", str(exc))
+            return
+        try:
+            analysis, (mod, history), (duplicates, related) = await prefetch
+            # Stamped last: ids are reserved out of commit order, so incremental
+            # syncs read by created_at with an overlap, which must cover the gap
+            # between this stamp and the insert.
+            ticket.update({"channel_id": str(channel["id"]), "priority": analysis["priority"], "suspicion_reason": analysis["reason"], "created_at": datetime.utcnow().isoformat()})
+            own = [d["ticket_id"] for d in duplicates if d["creator_id"] == ctx.user_id][:3] if self.config.duplicate_auto_link else []
+            # Same context ticket_context would read once the row exists.
+            cached = {"mod": mod, "history": {"total": history["total"] + 1, "last": ticket["created_at"]}, "links": [{"linked_ticket_id": d} for d in own]}
+            rendered = await self.render_ticket_payload(ticket, settings, cached, related)
+            msg = await self._timed("message", self.rest.send_channel_message(channel["id"], rendered))
+            ticket = await self._timed("insert", self.repo.create_ticket({**ticket, "message_id": str(msg["id"])}))
+        except Exception as exc:
+            # Without a ticket row the channel is unusable; don't leave it behind.
+            print(f"Ticket creation failed in guild {ctx.guild_id}: {exc}")
+            try:
+                await self.rest.delete_channel(channel["id"], reason="Ticket creation failed")
+            except Exception as cleanup_exc:
+                print(f"Could not delete channel {channel['id']}: {cleanup_exc}")
+            await asyncio.gather(creating, return_exceptions=True)
+            await self.notice(ctx, "error", "Setup error", "Could not create the ticket, please try again.")
+            return
+        self.renders.remember(msg["id"], rendered)
+        self.signals.record(ticket)
+        self._ticket_changed(ticket)
+        if own:
+            try:
+                pairs = [pair for other in own for pair in ((ticket["id"], other), (other, ticket["id"]))]
+                await self._timed("links", self.repo.add_links(ctx.guild_id, pairs, self.config.discord_app_id or "auto"))
+            except Exception as exc:
+                print(f"Duplicate linking failed for ticket {ticket['id']}: {exc}")
+        await creating
+        await self.notice(ctx, "success", "Ticket created", f"Ticket #{ticket['id']} created in <#{channel['id']}>.")
+        self.create_stages["total"].observe((time.perf_counter() - started) * 1000)
+
+    async def ticket_create(self, ctx: InteractionContext, params: dict):
+        settings = await self.repo.get_guild_settings(ctx.guild_id)
+        if not settings:
+            await self.notice(ctx, "error", "Not configured", "Run /ticket setup first.")
+            return
+        await self.create_ticket(ctx, settings, params.get("reason") or "", None)
+
+    async def ticket_setup(self, ctx: InteractionContext, params: dict):
+        if not ctx.is_admin_or_owner:
+            await self.notice(ctx, "error", "Not allowed", "Admin only.")
+            return
+        parent = ctx.data.get("resolved", {}).get("channels", {}).get(str(params.get("parent")), {})
+        category_id = parent.get("parent_id")
+        if not category_id:
+            await self.notice(ctx, "error", "Missing category", "Channel must be inside a category.")
+            return
+        normalized = with_defaults(await self.repo.get_guild_settings(ctx.guild_id))
+        await self.repo.upsert_guild_settings({
+            "guild_id": ctx.guild_id,
+            "ticket_parent_channel_id": str(category_id),
+            "staff_role_id": str(params.get("staff_role")),
+            "timezone": params.get("timezone") or "UTC",
+            "category_slots": normalized["category_slots"] if "category_slots" in normalized else 1,
+            "warn_threshold": normalized["warn_threshold"],
+            "warn_timeout_minutes": normalized["warn_timeout_minutes"],
+            "enable_smart_replies": normalized["enable_smart_replies"],
+            "enable_ai_suggestions": normalized["enable_ai_suggestions"],
+            "enable_auto_priority": normalized["enable_auto_priority"],
+        })
+        await self.notice(ctx, "success", "Setup complete", f"Configured tickets. Category: <#{category_id}>")
+
+    async def ticket_panel(self, ctx: InteractionContext, params: dict):
+        if not ctx.is_admin_or_owner:
+            await self.notice(ctx, "error", "Not allowed", "Admin only.")
+            return
+        settings = await self.repo.get_guild_settings(ctx.guild_id)
+        categories = await self.repo.list_categories(ctx.guild_id)
+        await self.send_message(ctx, render_settings_panel(settings, categories, 1), ephemeral=False)
+
+    async def ticket_panelset(self, ctx: InteractionContext, params: dict):
+        if not ctx.is_admin_or_owner:
+            await self.notice(ctx, "error", "Not allowed", "Admin only.")
+            return
+        settings = await self.repo.get_guild_settings(ctx.guild_id)
+        if not settings:
+            await self.notice(ctx, "error", "Not configured", "Run /ticket setup first.")
+            return
+        categories = await self.repo.list_categories(ctx.guild_id)
+        target = params.get("channel") or ctx.channel_id
+        await self.rest.send_channel_message(target, render_open_panel(categories))
+        await self.notice(ctx, "success", "Panel sent", f"Ticket panel sent to <#{target}>.")
+
+    async def info(self, ctx: InteractionContext, params: dict):
+        target_id = str(params.get("user") or ctx.user_id)
+        target = ctx.data.get("resolved", {}).get("users", {}).get(target_id)
+        target_name = target["username"] if target else ctx.user_name
+        if not self.config.discord_app_id or not str(self.config.discord_app_id).isdigit():
+            await self.notice(ctx, "error", "Missing App ID", "Set DISCORD_APP_ID in the environment.")
+            return
+        settings = await self.repo.get_guild_settings(ctx.guild_id)
+        if not settings:
+            await self.notice(ctx, "error", "Not configured", "Run /ticket setup first.")
+            return
+        await self.notice(ctx, "info", "Loading", "Generating charts...")
+        since = (datetime.utcnow() - timedelta(days=90)).isoformat()
+        timeline = await self.repo.rolling_tickets_by_creator(ctx.guild_id, target_id, since)
+        points90 = build_daily_series(90, timeline, settings.get("timezone") or self.config.timezone)
+        chart7, chart30, chart90 = await self.charts.render_windows(ctx.guild_id, target_id, points90)
+        stats = await self.repo.user_ticket_stats(ctx.guild_id, target_id)
+        history = await self.repo.user_ticket_history(ctx.guild_id, target_id)
+        summary = (
+            f"## {target_name}'s Ticket Summary\n"
+            f"- **Total tickets:** {history['total']}\n"
+            f"- **Created:** {stats['created']}\n"
+            f"- **Claimed:** {stats['claimed']}\n"
+            f"- **Closed:** {stats['closed']}\n"
+            f"- **Last activity:** {history['last'] or '-'}"
+        )
+        gallery = {
+            "type": 12,
+            "items": [
+                {"media": {"url": f"attachment://{chart7['filename']}"}},
+                {"media": {"url": f"attachment://{chart30['filename']}"}},
+                {"media": {"url": f"attachment://{chart90['filename']}"}},
+            ],
+        }
+        comps = [text_display(summary), separator(), gallery]
+        payload = {"flags": COMPONENTS_V2_FLAG, "components": [container(comps, 0x22C55E)]}
+        files = [
+            (chart7["filename"], chart7["buffer"].getvalue()),
+            (chart30["filename"], chart30["buffer"].getvalue()),
+            (chart90["filename"], chart90["buffer"].getvalue()),
+        ]
+        await self.acknowledged(ctx)
+        await self.rest.edit_original_response_with_files(ctx.application_id, ctx.token, payload, files)
+
+    async def mod_log(self, ctx: InteractionContext, params: dict):
+        if not ctx.is_admin_or_owner:
+            await self.notice(ctx, "error", "Not allowed", "Manage Server required.")
+            return
+        user_id = str(params["user"])
+        action = params["action"]
+        await self.repo.create_mod_action({
+            "guild_id": ctx.guild_id,
+            "user_id": user_id,
+            "action_type": action,
+            "reason": params.get("reason"),
+            "created_by": ctx.user_id,
+        })
+        self.mod_counts.record(ctx.guild_id, user_id, action)
+        settings = with_defaults(await self.repo.get_guild_settings(ctx.guild_id))
+        if action == "WARN":
+            summary = await self.mod_counts.counts(ctx.guild_id, user_id)
+            if summary["warnings"] >= settings["warn_threshold"]:
+                until = datetime.utcnow() + timedelta(minutes=settings["warn_timeout_minutes"])
+                try:
+                    await self.rest.timeout_member(ctx.guild_id, user_id, until.isoformat() + "+00:00", reason="Auto-timeout threshold reached")
+                except Exception as exc:
+                    print(f"Auto-timeout failed for {user_id}: {exc}")
+        await self.notice(ctx, "success", "Action logged", f"{action} logged for <@{user_id}>.")
+
+    async def mod_config(self, ctx: InteractionContext, params: dict):
+        if not ctx.is_admin_or_owner:
+            await self.notice(ctx, "error", "Not allowed", "Manage Server required.")
+            return
+        settings = await self.repo.get_guild_settings(ctx.guild_id)
+        if not settings:
+            await self.notice(ctx, "error", "Not configured", "Run /ticket setup first.")
+            return
+        warn_threshold, timeout_minutes = params["warn_threshold"], params["timeout_minutes"]
+        await self.repo.upsert_guild_settings({
+            **settings,
+            "warn_threshold": warn_threshold,
+            "warn_timeout_minutes": timeout_minutes,
+        })
+        await self.notice(ctx, "success", "Moderation configured", f"Auto-timeout after {warn_threshold} warnings for {timeout_minutes} minutes.")
+
+    async def category_add(self, ctx: InteractionContext, params: dict):
+        if not ctx.is_admin_or_owner:
+            await self.notice(ctx, "error", "Not allowed", "Admin only.")
+            return
+        await self.show_modal(
+            ctx,
+            "Add Ticket Category",
+            f"ticket:category:create:{ctx.message_id}",
+            [
+                {"type": 4, "custom_id": "category_name", "label": "Category name", "style": 1, "max_length": 60},
+                {"type": 4, "custom_id": "category_description", "label": "Category description", "style": 2, "max_length": 200},
+            ],
+        )
+
+    async def panel_page(self, ctx: InteractionContext, params: dict):
+        page = int(params.get("page", 1))
+        settings = await self.repo.get_guild_settings(ctx.guild_id)
+        categories = await self.repo.list_categories(ctx.guild_id)
+        await self.update_message(ctx, render_settings_panel(settings, categories, page))
+
+    async def slots(self, ctx: InteractionContext, params: dict):
+        if not ctx.is_admin_or_owner:
+            await self.notice(ctx, "error", "Not allowed", "Admin only.")
+            return
+        value = int(ctx.data.get("values", [0])[0])
+        if value < 1 or value > 35:
+            await self.notice(ctx, "error", "Invalid value", "Choose between 1 and 35.")
+            return
+        current = await self.repo.get_guild_settings(ctx.guild_id)
+        if not current:
+            await self.notice(ctx, "error", "Not configured", "Run /ticket setup first.")
+            return
+        await self.repo.upsert_guild_settings({**current, "category_slots": value})
+        categories = await self.repo.list_categories(ctx.guild_id)
+        await self.update_message(ctx, render_settings_panel({**current, "category_slots": value}, categories, 1))
+
+    async def settings_prompt(self, ctx: InteractionContext, params: dict):
+        if not ctx.is_admin_or_owner:
+            await self.notice(ctx, "error", "Not allowed", "Admin only.")
+            return
+        if params["field"] == "warn":
+            await self.show_modal(ctx, "Warn Threshold", f"ticket:settings:warn:{ctx.message_id}", [
+                {"type": 4, "custom_id": "warn_threshold", "label": "Warnings before timeout", "style": 1, "max_length": 3},
+            ])
+        else:
+            await self.show_modal(ctx, "Timeout Duration", f"ticket:settings:timeout:{ctx.message_id}", [
+                {"type": 4, "custom_id": "warn_timeout_minutes", "label": "Timeout minutes", "style": 1, "max_length": 4},
+            ])
+
+    async def toggle(self, ctx: InteractionContext, params: dict):
+        if not ctx.is_admin_or_owner:
+            await self.notice(ctx, "error", "Not allowed", "Admin only.")
+            return
+        settings = await self.repo.get_guild_settings(ctx.guild_id)
+        if not settings:
+            await self.notice(ctx, "error", "Not configured", "Run /ticket setup first.")
+            return
+        normalized = with_defaults(settings)
+        flag = {"smart": "enable_smart_replies", "ai": "enable_ai_suggestions", "priority": "enable_auto_priority"}.get(params["flag"])
+        if flag:
+            normalized[flag] = not normalized[flag]
+        await self.repo.upsert_guild_settings({**settings, **normalized})
+        categories = await self.repo.list_categories(ctx.guild_id)
+        await self.update_message(ctx, render_settings_panel({**settings, **normalized}, categories, 2))
+
+    async def open_prompt(self, ctx: InteractionContext, params: dict):
+        category_id = int(ctx.data.get("values", [None])[0])
+        categories = await self.repo.list_categories(ctx.guild_id)
+        category = next((c for c in categories if c["id"] == category_id), None)
+        if not category:
+            await self.notice(ctx, "error", "Invalid category", "Category not found.")
+            return
+        await self.show_modal(
+            ctx,
+            f"Open Ticket - {category['name']}"[:45],
+            f"ticket:open:create:{category['id']}",
+            [{"type": 4, "custom_id": "ticket_reason", "label": "Describe your issue", "style": 2, "max_length": 500}],
+        )
+
+    async def transcript(self, ctx: InteractionContext, params: dict):
+        ticket = await self.repo.get_ticket_by_message(ctx.message_id)
+        if not ticket:
+            await self.notice(ctx, "error", "Ticket missing", "This ticket could not be found.")
+            return
+        async def progress(state: str, count: int):
+            if state == "queued":
+                await self.notice(ctx, "info", "Transcript queued", "Waiting for other transcripts to finish...")
+            else:
+                await self.notice(ctx, "info", "Generating transcript", f"{count} messages so far...")
+
+        await self.transcripts.request(ticket, progress)
+        await self.notice(ctx, "success", "Transcript ready", "Transcript generated.")
+
+    async def link_prompt(self, ctx: InteractionContext, params: dict):
+        ticket = await self.repo.get_ticket_by_message(ctx.message_id)
+        if not ticket:
+            await self.notice(ctx, "error", "Ticket missing", "This ticket could not be found.")
+            return
+        await self.show_modal(
+            ctx,
+            "Link Ticket",
+            f"ticket:link:create:{ctx.message_id}:{ticket['id']}",
+            [{"type": 4, "custom_id": "linked_ticket_id", "label": "Ticket ID to link", "style": 1, "max_length": 12}],
+        )
+
+    async def transition(self, ctx: InteractionContext, params: dict):
+        action = params["action"]
+        settings = await self.repo.get_guild_settings(ctx.guild_id)
+        if not settings:
+            await self.notice(ctx, "error", "Not configured", "Run /ticket setup first.")
+            return
+        message_id = ctx.message_id
+        user_id = ctx.user_id
+        is_staff = ctx.has_staff_role(settings["staff_role_id"])
+        now_iso = datetime.utcnow().isoformat()
+        if action == "claim":
+            if not is_staff:
+                await self.notice(ctx, "error", "Not allowed", "Only staff can claim tickets.")
+                return
+            ticket = await self.repo.transition_ticket(message_id, "OPEN", {"status": "CLAIMED", "claimed_by": user_id, "claimed_at": now_iso})
+            if not ticket:
+                await self.notice(ctx, "error", "Invalid state", "Ticket is not open or was already claimed.")
+                return
+        elif action == "close":
+            ticket = await self.repo.transition_ticket(message_id, "CLAIMED", {"status": "CLOSED", "closed_by": user_id, "closed_at": now_iso}, None if is_staff else {"claimed_by": user_id})
+            if not ticket:
+                reason = "Ticket is not claimed." if is_staff else "Only the claimer or staff can close a claimed ticket."
+                await self.notice(ctx, "error", "Invalid state", reason)
+                return
+            await self.set_creator_can_send(ticket, False)
+        else:
+            ticket = await self.repo.transition_ticket(message_id, "CLOSED", {"status": "OPEN", "reopened_by": user_id, "reopened_at": now_iso}, None if is_staff else {"creator_id": user_id})
+            if not ticket:
+                reason = "Ticket is not closed." if is_staff else "Only creator or staff can reopen a closed ticket."
+                await self.notice(ctx, "error", "Invalid state", reason)
+                return
+            await self.set_creator_can_send(ticket, True)
+
+        self._ticket_changed(ticket)
+        self.renders.request(ticket)
+        await self.notice(ctx, "success", "Updated", "Ticket updated.")
+
+    async def transcript_messages(self, ticket: dict, progress=None, batch_size: int = 100):
+        # Archived messages up to the cursor, then only the gap from Discord,
+        # which is archived on the way through so the next transcript skips it.
+        channel_id = ticket["channel_id"]
+        cursor = (ticket.get("archive_cursor") or 0) if self.config.transcript_archive else 0
+        count = 0
+        if cursor:
+            async for row in self.repo.iter_ticket_messages(channel_id, cursor):
+                count += 1
+                if progress and count % batch_size == 0:
+                    progress(count)
+                yield message_from_row(row)
+        batch = []
+        async for msg in self.rest.iter_channel_messages(channel_id, after=str(cursor)):
+            count += 1
+            if progress and count % batch_size == 0:
+                progress(count)
+            if self.config.transcript_archive:
+                batch.append(archive_row(channel_id, msg))
+                if len(batch) >= batch_size:
+                    await self.repo.archive_ticket_messages(batch)
+                    batch = []
+            yield msg
+        if batch:
+            await self.repo.archive_ticket_messages(batch)
+
+    async def post_transcript(self, ticket: dict, progress=None):
+        transcript = await build_transcript(
+            self.transcript_messages(ticket, progress),
+            self.config.transcript_spool_kb * 1024,
+            self.config.transcript_gzip,
+        )
+        try:
+            await self.rest.send_channel_message_with_files(
+                ticket["channel_id"],
+                {"content": f"Transcript for ticket #{ticket['id']}"},
+                [(transcript["filename"], transcript["file"])],
+            )
+        finally:
+            transcript["file"].close()
+
+    async def category_create(self, ctx: InteractionContext, params: dict):
+        values = modal_values(ctx.data)
+        name = values.get("category_name", "").strip()
+        description = values.get("category_description", "").strip() or None
+        await self.repo.create_category(ctx.guild_id, name, description)
+        settings = await self.repo.get_guild_settings(ctx.guild_id)
+        categories = await self.repo.list_categories(ctx.guild_id)
+        await self.update_message(ctx, render_settings_panel(settings, categories, 1))
+
+    async def settings_submit(self, ctx: InteractionContext, params: dict):
+        values = modal_values(ctx.data)
+        settings = await self.repo.get_guild_settings(ctx.guild_id)
+        if not settings:
+            await self.notice(ctx, "error", "Not configured", "Run /ticket setup first.")
+            return
+        if params["field"] == "warn":
+            value = int(values.get("warn_threshold", "0"))
+            await self.repo.upsert_guild_settings({**settings, "warn_threshold": value})
+            await self.notice(ctx, "success", "Updated", f"Warn threshold set to {value}.")
+            return
+        value = int(values.get("warn_timeout_minutes", "0"))
+        await self.repo.upsert_guild_settings({**settings, "warn_timeout_minutes": value})
+        await self.notice(ctx, "success", "Updated", f"Timeout set to {value} minutes.")
+
+    async def open_submit(self, ctx: InteractionContext, params: dict):
+        reason = modal_values(ctx.data).get("ticket_reason", "").strip()
+        settings = await self.repo.get_guild_settings(ctx.guild_id)
+        categories = await self.repo.list_categories(ctx.guild_id)
+        category = next((c for c in categories if str(c["id"]) == params["category_id"]), None)
+        await self.create_ticket(ctx, settings or {}, reason, category)
+
+    async def link_submit(self, ctx: InteractionContext, params: dict):
+        linked = modal_values(ctx.data).get("linked_ticket_id", "").strip()
+        if not linked.isdigit():
+            await self.notice(ctx, "error", "Invalid ID", "Please provide a numeric ticket ID.")
+            return
+        linked_id = int(linked)
+        source_id = int(params["ticket_id"]) if "ticket_id" in params else None
+        await self.repo.add_link(ctx.guild_id, source_id, linked_id, ctx.user_id)
+        await self.repo.add_link(ctx.guild_id, linked_id, source_id, ctx.user_id)
+        ticket = await self.repo.get_ticket_by_message(ctx.message_id)
+        if ticket:
+            self.renders.request(ticket)
+        await self.notice(ctx, "success", "Linked", f"Linked ticket #{linked_id}.")
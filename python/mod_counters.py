@@ -0,0 +1,129 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+_FIELDS = {"WARN": "warnings", "MUTE": "mutes", "BAN": "bans"}
+
+
+class ModActionCounters:
+    # Per-(guild, user) mod_action_summary counts kept in memory so auto-moderation
+    # can check warn_threshold without three count queries per flagged message.
+    # WARN rows from the message path are queued and inserted in batches; an entry
+    # is reseeded from the database once it is older than ttl and has nothing queued,
+    # which picks up actions logged by the other process.
+    def __init__(self, repo, interval: float = 2.0, ttl: float = 60.0, max_users: int = 10000):
+        self.repo = repo
+        self.interval = interval
+        self.ttl = ttl
+        self.max_users = max_users
+        self._counts: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self._seeded: dict[tuple[str, str], float] = {}
+        self._seeding: dict[tuple[str, str], asyncio.Task] = {}
+        self._pending: list[dict] = []
+        self._inflight: list[dict] = []
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.seeds = 0
+        self.queued = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.errors = 0
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as exc:
+                print(f"Mod action flush failed: {exc}")
+
+    def _unwritten(self, key: tuple[str, str]):
+        return sum(1 for row in (*self._inflight, *self._pending) if (row["guild_id"], row["user_id"]) == key)
+
+    async def counts(self, guild_id: str, user_id: str):
+        key = (str(guild_id), str(user_id))
+        counts = self._counts.get(key)
+        if counts is not None and (time.monotonic() - self._seeded[key] < self.ttl or self._unwritten(key)):
+            self._counts.move_to_end(key)
+            self.hits += 1
+            return counts
+        # Concurrent messages from one user share a single seed query.
+        task = self._seeding.get(key)
+        if task is None:
+            task = self._seeding[key] = asyncio.create_task(self._seed(key))
+            task.add_done_callback(lambda _: self._seeding.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _seed(self, key: tuple[str, str]):
+        # Under the flush lock nothing is in flight: rows are either committed
+        # (in the summary) or still queued (added on top), never both.
+        async with self._lock:
+            summary = await self.repo.mod_summary(*key)
+            summary["warnings"] += self._unwritten(key)
+        self._counts[key] = summary
+        self._counts.move_to_end(key)
+        self._seeded[key] = time.monotonic()
+        while len(self._counts) > self.max_users:
+            evicted, _ = self._counts.popitem(last=False)
+            self._seeded.pop(evicted, None)
+        self.seeds += 1
+        return summary
+
+    def record(self, guild_id: str, user_id: str, action_type: str):
+        # For actions written directly (e.g. /mod log); a key not cached yet is
+        # seeded later and counts the new row from the database.
+        counts = self._counts.get((str(guild_id), str(user_id)))
+        if counts is not None:
+            counts[_FIELDS[action_type]] += 1
+
+    async def warn(self, payload: dict):
+        row = {**payload, "guild_id": str(payload["guild_id"]), "user_id": str(payload["user_id"]), "action_type": "WARN"}
+        counts = await self.counts(row["guild_id"], row["user_id"])
+        self._pending.append(row)
+        counts["warnings"] += 1
+        self.queued += 1
+        self.start()
+        return counts
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            self._inflight, self._pending = self._pending, []
+            try:
+                rows = await self.repo.create_mod_actions(self._inflight)
+            except Exception:
+                self.errors += 1
+                self._pending = self._inflight + self._pending
+                raise
+            finally:
+                self._inflight = []
+            self.flushes += 1
+            self.rows_written += len(rows)
+
+    def stats(self):
+        return {
+            "users": len(self._counts),
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "seeds": self.seeds,
+            "queued": self.queued,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "errors": self.errors,
+        }
@@ -0,0 +1,176 @@
+import asyncio
+
+import httpx
+
+
+class APIResponse:
+    def __init__(self, data, count: int | None = None):
+        self.data = data
+        self.count = count
+
+
+class AsyncQuery:
+    def __init__(self, client: "AsyncPostgrest", path: str):
+        self.client = client
+        self.path = path
+        self.method = "GET"
+        self.params: list[tuple[str, str]] = []
+        self.body = None
+        self.prefer: list[str] = []
+        self._negate = False
+
+    def select(self, columns: str = "*", count: str | None = None):
+        self.params.append(("select", columns.replace(" ", "")))
+        if count:
+            self.prefer.append(f"count={count}")
+        return self
+
+    def insert(self, payload):
+        self.method = "POST"
+        self.body = payload
+        self.prefer.append("return=representation")
+        return self
+
+    def upsert(self, payload):
+        self.method = "POST"
+        self.body = payload
+        self.prefer.extend(["return=representation", "resolution=merge-duplicates"])
+        return self
+
+    def update(self, payload: dict):
+        self.method = "PATCH"
+        self.body = payload
+        self.prefer.append("return=representation")
+        return self
+
+    def delete(self):
+        self.method = "DELETE"
+        self.prefer.append("return=representation")
+        return self
+
+    def _filter(self, column: str, op: str, value):
+        if isinstance(value, bool):
+            value = str(value).lower()
+        if self._negate:
+            op, self._negate = f"not.{op}", False
+        self.params.append((column, f"{op}.{value}"))
+        return self
+
+    @property
+    def not_(self):
+        # Same shape as supabase-py: q.not_.is_("col", "null") negates the next filter.
+        self._negate = True
+        return self
+
+    def eq(self, column: str, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column: str, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column: str, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column: str, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column: str, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column: str, value):
+        return self._filter(column, "lte", value)
+
+    def is_(self, column: str, value):
+        return self._filter(column, "is", "null" if value is None else value)
+
+    def in_(self, column: str, values: list):
+        return self._filter(column, "in", f"({','.join(str(v) for v in values)})")
+
+    def order(self, column: str, desc: bool = False):
+        self.params.append(("order", f"{column}.{'desc' if desc else 'asc'}"))
+        return self
+
+    def limit(self, size: int):
+        self.params.append(("limit", str(size)))
+        return self
+
+    async def execute(self):
+        headers = {"Prefer": ",".join(self.prefer)} if self.prefer else {}
+        return await self.client.request(self.method, self.path, params=self.params, json=self.body, headers=headers)
+
+
+# Mirrors the subset of the supabase-py query builder DataRepo uses, but
+# execute() is awaited on a pooled HTTP/2 client instead of blocking a thread.
+class AsyncPostgrest:
+    is_async = True
+
+    def __init__(self, url: str, key: str, schema: str = "public", max_concurrency: int = 10, timeout: float = 10.0):
+        self.max_concurrency = max_concurrency
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._in_flight = 0
+        self._requests = 0
+        self._errors = 0
+        self._peak_waiting = 0
+        self._http = httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/rest/v1",
+            http2=True,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency, keepalive_expiry=60),
+            headers={
+                "apikey": key,
+                "Authorization": f"Bearer {key}",
+                "Accept-Profile": schema,
+                "Content-Profile": schema,
+            },
+        )
+
+    def table(self, name: str):
+        return AsyncQuery(self, f"/{name}")
+
+    def rpc(self, fn: str, params: dict | None = None):
+        query = AsyncQuery(self, f"/rpc/{fn}")
+        query.method = "POST"
+        query.body = params or {}
+        return query
+
+    async def request(self, method: str, path: str, params=None, json=None, headers=None):
+        self._waiting += 1
+        self._peak_waiting = max(self._peak_waiting, self._waiting)
+        try:
+            await self._sem.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        self._requests += 1
+        try:
+            resp = await self._http.request(method, path, params=params, json=json, headers=headers)
+        finally:
+            self._in_flight -= 1
+            self._sem.release()
+        if resp.status_code >= 400:
+            self._errors += 1
+            raise RuntimeError(f"PostgREST {method} {path} failed: {resp.status_code} {resp.text}")
+        data = resp.json() if resp.content else None
+        return APIResponse(data, _parse_count(resp.headers.get("content-range")))
+
+    def stats(self):
+        return {
+            "backend": "async",
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "peak_queue_depth": self._peak_waiting,
+            "requests": self._requests,
+            "errors": self._errors,
+        }
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+def _parse_count(content_range: str | None):
+    if not content_range or "/" not in content_range:
+        return None
+    total = content_range.rsplit("/", 1)[1]
+    return int(total) if total.isdigit() else None
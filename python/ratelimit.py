@@ -0,0 +1,255 @@
+import asyncio
+import heapq
+import itertools
+import re
+import time
+
+PRIORITY_INTERACTION = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BACKGROUND = 2
+
+_MAJOR_PARAMS = ("channels", "guilds", "webhooks")
+_SNOWFLAKE = re.compile(r"^\d{15,21}$")
+
+
+def route_key(method: str, path: str):
+    segments = path.strip("/").split("/")
+    out = []
+    keep_next = 0
+    for seg in segments:
+        if keep_next:
+            out.append(seg)
+            keep_next -= 1
+            continue
+        if seg in _MAJOR_PARAMS:
+            keep_next = 2 if seg == "webhooks" else 1
+        elif seg == "interactions":
+            keep_next = 2
+        elif _SNOWFLAKE.match(seg):
+            seg = ":id"
+        out.append(seg)
+    return f"{method} /{'/'.join(out)}"
+
+
+def major_params(path: str):
+    segments = path.strip("/").split("/")
+    if len(segments) >= 2 and segments[0] in _MAJOR_PARAMS + ("interactions",):
+        return "/".join(segments[:3] if segments[0] in ("webhooks", "interactions") else segments[:2])
+    return ""
+
+
+def is_global_exempt(path: str):
+    # Interaction callbacks and interaction webhooks do not count against the bot's global limit.
+    return path.startswith("/interactions/") or path.startswith("/webhooks/")
+
+
+class Bucket:
+    def __init__(self, limit: int = 1, period: float | None = None):
+        self.limit = limit
+        self.tokens = limit
+        self.period = period
+        self.reset_at = 0.0
+        self.inflight = 0
+        self.last_used = time.monotonic()
+        self._waiters: list = []
+        self._timer: asyncio.TimerHandle | None = None
+
+    def _refill(self, now: float):
+        if now < self.reset_at:
+            return
+        if self.period:
+            self.tokens = self.limit
+            self.reset_at = now + self.period
+        elif self.tokens <= 0:
+            self.tokens = self.limit - self.inflight
+
+    def _grant(self):
+        self.tokens -= 1
+        if not self.period:
+            self.inflight += 1
+        self.last_used = time.monotonic()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters and self.tokens > 0:
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self._grant()
+            fut.set_result(None)
+        self._waiters = [w for w in self._waiters if not w[2].done()]
+        heapq.heapify(self._waiters)
+        # Without a known reset, tokens come back through release(), not a timer.
+        if self._waiters and self.tokens <= 0 and self._timer is None and (self.period or self.reset_at > now):
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(max(0.0, self.reset_at - now) + 0.01, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    async def acquire(self, priority: int, seq: int):
+        self._refill(time.monotonic())
+        if not self._waiters and self.tokens > 0:
+            self._grant()
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, seq, fut))
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Granted but never used: a period bucket gets its token back.
+                if self.period:
+                    self.tokens = min(self.limit, self.tokens + 1)
+                self.release()
+            raise
+
+    def release(self):
+        if not self.period:
+            self.inflight = max(0, self.inflight - 1)
+        self._dispatch()
+
+    def update(self, limit: int | None, remaining: int | None, reset_after: float | None, pending: int = 0):
+        # remaining is Discord's view after this request; requests still in
+        # flight (pending) will consume more of it.
+        if limit is not None:
+            self.limit = limit
+        if remaining is not None:
+            self.tokens = remaining - pending
+        if reset_after is not None:
+            self.reset_at = time.monotonic() + reset_after
+
+    def block(self, retry_after: float):
+        self.tokens = 0
+        self.reset_at = time.monotonic() + retry_after
+
+    def idle(self, now: float):
+        return not self._waiters and self.inflight == 0 and now - self.last_used > 60 and now >= self.reset_at
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+
+class _Slot:
+    def __init__(self, limiter: "RateLimiter", route: str, bucket: Bucket, path: str):
+        self.limiter = limiter
+        self.route = route
+        self.bucket = bucket
+        self.path = path
+
+    def update(self, headers):
+        self.limiter._apply_headers(self.route, self.bucket, self.path, headers)
+
+    def rate_limited(self, retry_after: float, is_global: bool):
+        self.limiter.rate_limited += 1
+        if is_global:
+            self.limiter.global_bucket.block(retry_after)
+        else:
+            self.bucket.block(retry_after)
+
+
+class RateLimiter:
+    def __init__(self, global_limit: int = 50):
+        self.global_bucket = Bucket(global_limit, period=1.0)
+        self._route_to_hash: dict[str, str] = {}
+        self._buckets: dict[str, Bucket] = {}
+        self._seq = itertools.count()
+        self._calls = 0
+        self.rate_limited = 0
+        self._waits: dict[int, dict] = {}
+
+    def _bucket_for(self, route: str, path: str):
+        bucket_hash = self._route_to_hash.get(route)
+        key = f"{bucket_hash}:{major_params(path)}" if bucket_hash else route
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = Bucket()
+        return bucket
+
+    def _apply_headers(self, route: str, bucket: Bucket, path: str, headers):
+        limits = (_int(headers.get("X-RateLimit-Limit")), _int(headers.get("X-RateLimit-Remaining")), _float(headers.get("X-RateLimit-Reset-After")))
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        if bucket_hash and self._route_to_hash.get(route) != bucket_hash:
+            self._route_to_hash[route] = bucket_hash
+            key = f"{bucket_hash}:{major_params(path)}"
+            if self._buckets.get(route) is bucket:
+                del self._buckets[route]
+            shared = self._buckets.setdefault(key, bucket)
+            if shared is not bucket:
+                shared.update(*limits, pending=shared.inflight)
+        bucket.update(*limits, pending=max(0, bucket.inflight - 1))
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [k for k, b in self._buckets.items() if b.idle(now)]:
+            del self._buckets[key]
+
+    def acquire(self, method: str, path: str, priority: int = PRIORITY_DEFAULT):
+        return _Acquire(self, method, path, priority)
+
+    def _record_wait(self, priority: int, waited: float):
+        entry = self._waits.setdefault(priority, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        ms = waited * 1000
+        entry["count"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+
+    def stats(self):
+        return {
+            "buckets": len(self._buckets),
+            "queued": sum(b.queued for b in self._buckets.values()) + self.global_bucket.queued,
+            "rate_limited": self.rate_limited,
+            "queue_wait": {
+                str(p): {**w, "avg_ms": round(w["total_ms"] / w["count"], 2) if w["count"] else 0.0}
+                for p, w in self._waits.items()
+            },
+        }
+
+
+class _Acquire:
+    def __init__(self, limiter: RateLimiter, method: str, path: str, priority: int):
+        self.limiter = limiter
+        self.route = route_key(method, path)
+        self.path = path
+        self.priority = priority
+        self.bucket: Bucket | None = None
+
+    async def __aenter__(self):
+        limiter = self.limiter
+        limiter._calls += 1
+        if limiter._calls % 500 == 0:
+            limiter._prune()
+        started = time.monotonic()
+        seq = next(limiter._seq)
+        self.bucket = limiter._bucket_for(self.route, self.path)
+        await self.bucket.acquire(self.priority, seq)
+        if not is_global_exempt(self.path):
+            try:
+                await limiter.global_bucket.acquire(self.priority, seq)
+            except BaseException:
+                self.bucket.release()
+                raise
+        limiter._record_wait(self.priority, time.monotonic() - started)
+        return _Slot(limiter, self.route, self.bucket, self.path)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.bucket.release()
+        return False
+
+
+def _int(value):
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _float(value):
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
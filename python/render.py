@@ -23,7 +23,7 @@ def _bullet_block(title: str, rows: list[tuple[str, str]]):
     return text_display(f"### {title}\n{lines}")
 
 
-def render_ticket_message(ticket: dict, creator_mention: str, timezone: str, moderation: dict | None, links: list[int], suggestions: list[str]):
+def render_ticket_message(ticket: dict, creator_mention: str, timezone: str, moderation: dict | None, links: list[int], suggestions: list[str], similar: list[dict] | None = None):
     overview = [
         ("Ticket ID", _pad_id(ticket["id"])),
         ("Status", STATUS_LABEL.get(ticket["status"], ticket["status"])),
@@ -70,12 +70,20 @@ def render_ticket_message(ticket: dict, creator_mention: str, timezone: str, mod
             ),
         ])
 
+    similar = [s for s in similar or [] if s["ticket_id"] not in links]
+    top = next((s for s in similar if s.get("snippet")), None)
+    if top:
+        suggestions = [*suggestions, f"Compare with resolved #{_pad_id(top['ticket_id'])}: \"{top['snippet']}\""]
     if suggestions:
         components.extend([separator(), text_display("### Suggested Replies\n" + "\n".join([f"- {s}" for s in suggestions]))])
 
+    linked = [f"- #{_pad_id(i)}" for i in links] + [
+        f"- #{_pad_id(s['ticket_id'])} ({'possible duplicate' if s.get('kind') == 'duplicate' else 'similar'}, {round(s['score'] * 100)}%)"
+        for s in similar
+    ]
     components.extend([
         separator(),
-        text_display("### Linked Tickets\n" + ("\n".join([f"- #{_pad_id(i)}" for i in links]) if links else "- None")),
+        text_display("### Linked Tickets\n" + ("\n".join(linked) if linked else "- None")),
     ])
 
     buttons = []
@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+import json
+
+from .cache import TTLCache
+
+
+def payload_hash(payload: dict):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class TicketRenderQueue:
+    def __init__(self, render, edit, window: float = 0.75, max_messages: int = 4096):
+        self.render = render
+        self.edit = edit
+        self.window = window
+        self._latest: dict[int, dict] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._hashes = TTLCache(max_messages, ttl=24 * 3600)
+        self.requested = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.edits = 0
+        self.errors = 0
+
+    def remember(self, message_id, payload: dict):
+        self._hashes.set(str(message_id), payload_hash(payload))
+
+    def request(self, ticket: dict):
+        ticket_id = ticket["id"]
+        self.requested += 1
+        if ticket_id in self._latest:
+            self.coalesced += 1
+        self._latest[ticket_id] = ticket
+        if ticket_id not in self._tasks:
+            self._tasks[ticket_id] = asyncio.create_task(self._run(ticket_id))
+
+    async def _run(self, ticket_id: int):
+        try:
+            while True:
+                await asyncio.sleep(self.window)
+                ticket = self._latest.pop(ticket_id, None)
+                if ticket is None:
+                    return
+                await self._render(ticket)
+        finally:
+            self._tasks.pop(ticket_id, None)
+
+    async def _render(self, ticket: dict):
+        if not ticket.get("message_id"):
+            return
+        message_id = str(ticket["message_id"])
+        try:
+            payload = await self.render(ticket)
+            digest = payload_hash(payload)
+            if self._hashes.get(message_id) == digest:
+                self.skipped += 1
+                return
+            await self.edit(int(ticket["channel_id"]), int(message_id), payload)
+            self._hashes.set(message_id, digest)
+            self.edits += 1
+        except Exception as exc:
+            self.errors += 1
+            self._hashes.invalidate(message_id)
+            print(f"Ticket #{ticket['id']} re-render failed: {exc}")
+
+    async def drain(self):
+        self.window = 0
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def stats(self):
+        return {
+            "pending": len(self._latest),
+            "requested": self.requested,
+            "coalesced": self.coalesced,
+            "skipped_unchanged": self.skipped,
+            "edits": self.edits,
+            "errors": self.errors,
+        }
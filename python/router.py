@@ -0,0 +1,124 @@
+import asyncio
+import bisect
+import re
+import time
+
+DEFER_REPLY = 5
+DEFER_UPDATE = 6
+
+_BOUNDS_MS = (10, 25, 50, 100, 250, 500, 1000, 1500, 2000, 3000, 5000, 10000)
+
+
+class LatencyHistogram:
+    def __init__(self, bounds: tuple = _BOUNDS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+
+    def quantile(self, q: float):
+        # Upper bound of the bucket holding the q-th sample; overflow reports the last bound.
+        if not self.total:
+            return 0.0
+        rank = q * self.total
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return float(self.bounds[min(idx, len(self.bounds) - 1)])
+        return float(self.bounds[-1])
+
+    def stats(self):
+        return {
+            "count": self.total,
+            "avg_ms": round(self.sum_ms / self.total, 1) if self.total else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": {f"le_{b}": c for b, c in zip(self.bounds + ("inf",), self.counts) if c},
+        }
+
+
+class Route:
+    def __init__(self, kind: int, key: str, handler, defer: int | None):
+        self.kind = kind
+        self.key = key
+        self.pattern = re.compile(key)
+        self.handler = handler
+        self.defer = defer
+        self.ack = LatencyHistogram()
+        self.duration = LatencyHistogram()
+        self.deferred = 0
+        self.predicted = 0
+        self.errors = 0
+
+    def stats(self):
+        return {
+            "pattern": self.key,
+            "defer": self.defer,
+            "deferred": self.deferred,
+            "predicted": self.predicted,
+            "errors": self.errors,
+            "ack": self.ack.stats(),
+            "duration": self.duration.stats(),
+        }
+
+
+class InteractionRouter:
+    def __init__(self, budget: float = 2.0, min_samples: int = 20):
+        self.budget = budget
+        self.min_samples = min_samples
+        self._routes: dict[int, list[Route]] = {}
+        self.unmatched = 0
+
+    def add(self, kind: int, key: str, handler, defer: int | None = None):
+        # defer=None leaves a route undeferred: modal replies cannot follow a
+        # deferral, and public replies would be hidden by an ephemeral one.
+        self._routes.setdefault(kind, []).append(Route(kind, key, handler, defer))
+
+    def match(self, kind: int, key: str):
+        for route in self._routes.get(kind, []):
+            found = route.pattern.fullmatch(key)
+            if found:
+                return route, {k: v for k, v in found.groupdict().items() if v is not None}
+        self.unmatched += 1
+        return None, None
+
+    async def run(self, ctx, route: Route, params: dict, defer):
+        started = time.monotonic()
+        watchdog = None
+        if route.defer is not None:
+            if route.ack.total >= self.min_samples and route.ack.quantile(0.95) >= self.budget * 1000:
+                route.predicted += 1
+                await defer(ctx, route.defer)
+            else:
+                watchdog = asyncio.create_task(self._watchdog(ctx, route, defer))
+        try:
+            await route.handler(ctx, params)
+        except Exception:
+            route.errors += 1
+            raise
+        finally:
+            if watchdog and not watchdog.done():
+                watchdog.cancel()
+            finished = time.monotonic()
+            route.ack.observe(((ctx.first_response_at or finished) - started) * 1000)
+            route.duration.observe((finished - started) * 1000)
+
+    async def _watchdog(self, ctx, route: Route, defer):
+        await asyncio.sleep(self.budget)
+        if not ctx.responded:
+            route.deferred += 1
+            await defer(ctx, route.defer)
+
+    def stats(self):
+        return {
+            "budget_ms": int(self.budget * 1000),
+            "unmatched": self.unmatched,
+            "routes": {route.handler.__name__: route.stats() for routes in self._routes.values() for route in routes},
+        }
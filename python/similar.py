@@ -0,0 +1,242 @@
+import asyncio
+import math
+from array import array
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .analysis import tokenize_words
+
+# Below this many documents norms are refreshed before every query that follows an add.
+SMALL_INDEX = 2048
+
+_STOPWORDS = frozenset(
+    "an and are as at be but by can do does for from get got has have he her his how i if in into is it its "
+    "just me my no not of on or our please so than that the their them then there they this to too was we "
+    "were what when which who why will with would you your".split()
+)
+
+
+def tokenize(text: str | None):
+    return [w for w in tokenize_words(text) if len(w) > 1 and w not in _STOPWORDS]
+
+
+class GuildIndex:
+    # Incremental TF-IDF over closed tickets: one posting list per term holding
+    # (doc, 1 + log tf). Postings are append-only arrays, so a close is O(terms);
+    # doc norms depend on idf and are recomputed in one numpy pass whenever the
+    # corpus has grown by a tenth since the last pass, and before any query
+    # while the index is small enough for idf to move with every add.
+    def __init__(self):
+        self.vocab: dict[str, int] = {}
+        self.df = array("i")
+        self.docs: list[array] = []
+        self.weights: list[array] = []
+        self.ticket_ids = array("q")
+        self.snippets: list[str] = []
+        self.norms = array("f")
+        self._doc_of: dict[int, int] = {}
+        self._normalized_at = 0
+        self.synced_at: str | None = None
+
+    def __len__(self):
+        return len(self.ticket_ids)
+
+    def _idf(self):
+        return np.log((1 + len(self)) / (1 + np.frombuffer(self.df, dtype=np.int32))) + 1
+
+    def add(self, ticket_id: int, text: str | None):
+        if ticket_id in self._doc_of:
+            return False
+        counts = Counter(tokenize(text))
+        if not counts:
+            return False
+        doc = len(self.ticket_ids)
+        n = doc + 1
+        norm = 0.0
+        for term, count in counts.items():
+            idx = self.vocab.get(term)
+            if idx is None:
+                idx = self.vocab[term] = len(self.df)
+                self.df.append(0)
+                self.docs.append(array("i"))
+                self.weights.append(array("f"))
+            self.df[idx] += 1
+            weight = 1 + math.log(count)
+            self.docs[idx].append(doc)
+            self.weights[idx].append(weight)
+            norm += (weight * (math.log((1 + n) / (1 + self.df[idx])) + 1)) ** 2
+        self.ticket_ids.append(ticket_id)
+        self.snippets.append(" ".join((text or "").split())[:90])
+        self.norms.append(math.sqrt(norm))
+        self._doc_of[ticket_id] = doc
+        if n >= self._normalized_at * 1.1 + 16:
+            self.normalize()
+        return True
+
+    def normalize(self):
+        idf = self._idf()
+        lengths = np.fromiter((len(d) for d in self.docs), dtype=np.int64, count=len(self.docs))
+        docs = np.concatenate([np.frombuffer(d, dtype=np.int32) for d in self.docs]) if self.docs else np.empty(0, np.int32)
+        weights = np.concatenate([np.frombuffer(w, dtype=np.float32) for w in self.weights]) if self.weights else np.empty(0, np.float32)
+        weights = weights * np.repeat(idf, lengths)
+        norms = np.sqrt(np.bincount(docs, weights=weights * weights, minlength=len(self))).astype(np.float32)
+        self.norms = _array("f", norms)
+        self._normalized_at = len(self)
+
+    def query(self, text: str | None, k: int = 3, exclude: int | None = None, min_score: float = 0.2):
+        terms = [(self.vocab[t], 1 + math.log(c)) for t, c in Counter(tokenize(text)).items() if t in self.vocab]
+        if not terms or not len(self):
+            return []
+        if len(self) != self._normalized_at and len(self) < SMALL_INDEX:
+            self.normalize()
+        idf = self._idf()
+        docs = np.concatenate([np.frombuffer(self.docs[t], dtype=np.int32) for t, _ in terms])
+        weights = np.concatenate([np.frombuffer(self.weights[t], dtype=np.float32) * (qtf * idf[t] * idf[t]) for t, qtf in terms])
+        scores = np.bincount(docs, weights=weights, minlength=len(self))
+        query_norm = math.sqrt(sum((qtf * idf[t]) ** 2 for t, qtf in terms))
+        scores /= np.maximum(np.frombuffer(self.norms, dtype=np.float32), 1e-9) * query_norm
+        if exclude in self._doc_of:
+            scores[self._doc_of[exclude]] = 0
+        top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [
+            # Norms lag idf by up to a tenth of the corpus between passes.
+            {"ticket_id": int(self.ticket_ids[i]), "score": round(min(float(scores[i]), 1.0), 3), "snippet": self.snippets[i]}
+            for i in top
+            if scores[i] >= min_score
+        ]
+
+
+def _array(typecode: str, values: np.ndarray):
+    out = array(typecode)
+    out.frombytes(values.tobytes())
+    return out
+
+
+def build_index(rows: list[dict]):
+    # Bulk load: tokens become (doc, term) pairs that numpy counts and groups by
+    # term in one go, instead of one posting append per token.
+    index = GuildIndex()
+    # New terms get the next id without leaving C: default_factory is len().
+    vocab = defaultdict()
+    vocab.default_factory = vocab.__len__
+    docs, terms = [], []
+    for row in rows:
+        tokens = tokenize(row.get("query_text"))
+        if not tokens or row["id"] in index._doc_of:
+            continue
+        doc = len(index.ticket_ids)
+        docs.extend([doc] * len(tokens))
+        terms.extend(map(vocab.__getitem__, tokens))
+        index.ticket_ids.append(row["id"])
+        index.snippets.append(" ".join((row.get("query_text") or "").split())[:90])
+        index._doc_of[row["id"]] = doc
+    index.vocab = dict(vocab)
+    size = max(len(vocab), 1)
+    pairs, counts = np.unique(np.asarray(docs, np.int64) * size + np.asarray(terms, np.int64), return_counts=True)
+    term_of = pairs % size
+    order = np.argsort(term_of, kind="stable")
+    doc_col = (pairs // size)[order].astype(np.int32)
+    weights = (1 + np.log(counts[order])).astype(np.float32)
+    df = np.bincount(term_of, minlength=len(vocab)).astype(np.int32)
+    bounds = np.cumsum(df)[:-1]
+    index.df = _array("i", df)
+    index.docs = [_array("i", d) for d in np.split(doc_col, bounds)] if len(vocab) else []
+    index.weights = [_array("f", w) for w in np.split(weights, bounds)] if len(vocab) else []
+    index.normalize()
+    return index
+
+
+class SimilarTickets:
+    def __init__(self, repo, k: int = 3, max_guilds: int = 64, sync_seconds: float = 60.0, min_score: float = 0.2):
+        self.repo = repo
+        self.k = k
+        self.max_guilds = max_guilds
+        self.sync_seconds = sync_seconds
+        self.overlap = max(2 * sync_seconds, 60.0)
+        self.min_score = min_score
+        self._guilds: OrderedDict[str, GuildIndex] = OrderedDict()
+        self._loading: dict[str, asyncio.Task] = {}
+        self._syncing: dict[str, asyncio.Task] = {}
+        self.queries = 0
+        self.loads = 0
+        self.added = 0
+
+    def track(self, ticket: dict | None):
+        # Ticket listener: a ticket joins its guild's index when it closes.
+        if not ticket or ticket.get("status") != "CLOSED":
+            return
+        index = self._guilds.get(str(ticket["guild_id"]))
+        if index is not None and index.add(ticket["id"], ticket.get("query_text")):
+            self.added += 1
+
+    async def similar(self, ticket: dict, timeout: float = 1.0):
+        if self.k <= 0:
+            return []
+        guild_id = str(ticket["guild_id"])
+        index = self._guilds.get(guild_id)
+        if index is None:
+            task = self._loading.get(guild_id)
+            if task is None:
+                task = self._loading[guild_id] = asyncio.create_task(self._load(guild_id))
+                task.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+            # The first ticket in a guild waits briefly for the build; if it is
+            # slower, that render goes without and the next one has it.
+            try:
+                index = await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.TimeoutError:
+                return []
+            except Exception as exc:
+                print(f"Similar ticket index load failed for guild {guild_id}: {exc}")
+                return []
+        self._guilds.move_to_end(guild_id)
+        self._maybe_sync(guild_id, index)
+        self.queries += 1
+        return index.query(ticket.get("query_text"), self.k, ticket["id"], self.min_score)
+
+    async def _load(self, guild_id: str):
+        started = datetime.utcnow().isoformat()
+        rows = await self.repo.list_closed_ticket_texts(guild_id)
+        # Tokenizing 100k tickets takes a while; keep it off the event loop.
+        index = await asyncio.to_thread(build_index, rows)
+        index.synced_at = started
+        self._guilds[guild_id] = index
+        while len(self._guilds) > self.max_guilds:
+            self._guilds.popitem(last=False)
+        self.loads += 1
+        return index
+
+    def _maybe_sync(self, guild_id: str, index: GuildIndex):
+        # Tickets closed by the other process reach this index by polling.
+        if guild_id in self._syncing or not index.synced_at:
+            return
+        if (datetime.utcnow() - datetime.fromisoformat(index.synced_at)).total_seconds() < self.sync_seconds:
+            return
+        task = self._syncing[guild_id] = asyncio.create_task(self._sync(guild_id, index))
+        task.add_done_callback(lambda _: self._syncing.pop(guild_id, None))
+
+    async def _sync(self, guild_id: str, index: GuildIndex):
+        started = datetime.utcnow().isoformat()
+        # closed_at is stamped before the close commits, so re-read a trailing
+        # overlap; add skips ids already indexed.
+        since = (datetime.fromisoformat(index.synced_at) - timedelta(seconds=self.overlap)).isoformat()
+        try:
+            for row in await self.repo.list_closed_ticket_texts(guild_id, since):
+                if index.add(row["id"], row.get("query_text")):
+                    self.added += 1
+            index.synced_at = started
+        except Exception as exc:
+            print(f"Similar ticket sync failed: {exc}")
+
+    def stats(self):
+        return {
+            "guilds": len(self._guilds),
+            "documents": sum(len(index) for index in self._guilds.values()),
+            "terms": sum(len(index.vocab) for index in self._guilds.values()),
+            "loading": len(self._loading),
+            "loads": self.loads,
+            "queries": self.queries,
+            "added": self.added,
+        }
@@ -1,8 +1,15 @@
 from supabase import create_client, ClientOptions
 
 from .config import Config
+from .postgrest_async import AsyncPostgrest
 
 
 def build_supabase(config: Config):
     options = ClientOptions(schema=config.supabase_schema)
     return create_client(config.supabase_url, config.supabase_service_key, options=options)
+
+
+def build_data_backend(config: Config):
+    if config.data_backend == "async":
+        return AsyncPostgrest(config.supabase_url, config.supabase_service_key, config.supabase_schema, config.db_max_concurrency)
+    return build_supabase(config)
@@ -0,0 +1,58 @@
+ACTIVE_STATUSES = ("OPEN", "CLAIMED")
+_TRANSITION_FIELDS = ("status", "claimed_by", "claimed_at", "closed_by", "closed_at", "reopened_by", "reopened_at")
+
+
+class TicketChannelIndex:
+    def __init__(self):
+        self.ready = False
+        self._guilds: dict[str, dict[str, dict]] = {}
+
+    def load(self, tickets: list[dict]):
+        self._guilds.clear()
+        for ticket in tickets:
+            self.track(ticket)
+        self.ready = True
+
+    def track(self, ticket: dict | None):
+        if not ticket:
+            return
+        guild_id = str(ticket["guild_id"])
+        channel_id = str(ticket["channel_id"])
+        if ticket.get("status") in ACTIVE_STATUSES:
+            self._guilds.setdefault(guild_id, {})[channel_id] = ticket
+        else:
+            self.remove(guild_id, channel_id)
+
+    def refresh(self, ticket: dict | None):
+        # Activity flushes return rows read before any later claim/close, so they
+        # only update tickets still indexed and keep the index's transition state.
+        if not ticket:
+            return
+        current = self.get(ticket["guild_id"], ticket["channel_id"])
+        if current is None:
+            return
+        if ticket.get("status") not in ACTIVE_STATUSES:
+            self.remove(ticket["guild_id"], ticket["channel_id"])
+            return
+        self._guilds[str(ticket["guild_id"])][str(ticket["channel_id"])] = {**ticket, **{k: current.get(k) for k in _TRANSITION_FIELDS}}
+
+    def get(self, guild_id: str, channel_id: str):
+        return self._guilds.get(str(guild_id), {}).get(str(channel_id))
+
+    def remove(self, guild_id: str, channel_id: str):
+        channels = self._guilds.get(str(guild_id))
+        if channels is None:
+            return
+        channels.pop(str(channel_id), None)
+        if not channels:
+            del self._guilds[str(guild_id)]
+
+    def drop_guild(self, guild_id: str):
+        self._guilds.pop(str(guild_id), None)
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "guilds": len(self._guilds),
+            "channels": sum(len(c) for c in self._guilds.values()),
+        }
@@ -0,0 +1,135 @@
+import asyncio
+import bisect
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+_TARGET = re.compile(r"<@!?(\d{17,20})>|\b(\d{17,20})\b")
+
+
+def report_targets(text: str | None):
+    # A "target" is any user a ticket names, by mention or raw ID.
+    return {mention or raw for mention, raw in _TARGET.findall(text or "")}
+
+
+def _epoch(iso: str):
+    parsed = datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    if not parsed.tzinfo:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class SlidingWindowCounter:
+    def __init__(self, window: float):
+        self.window = window
+        self._events: dict[tuple, list[float]] = {}
+
+    def add(self, key: tuple, at: float):
+        # Kept sorted: rows synced from other processes can arrive late.
+        bisect.insort(self._events.setdefault(key, []), at)
+
+    def count(self, key: tuple, now: float | None = None):
+        events = self._events.get(key)
+        if not events:
+            return 0
+        expired = bisect.bisect_right(events, (now or time.time()) - self.window)
+        if expired:
+            del events[:expired]
+            if not events:
+                del self._events[key]
+        return len(events)
+
+    def prune(self, now: float | None = None):
+        for key in list(self._events):
+            self.count(key, now)
+
+    def __len__(self):
+        return len(self._events)
+
+
+class TicketSignals:
+    def __init__(self, repo, window_hours: float = 24, sync_seconds: float = 30.0):
+        self.repo = repo
+        self.window = window_hours * 3600
+        self.sync_seconds = sync_seconds
+        self.tickets = SlidingWindowCounter(self.window)
+        self.reports = SlidingWindowCounter(self.window)
+        self.ready = False
+        # Ticket ids are reserved before the insert and created_at is stamped
+        # before it commits, so rows can land late and out of id order; every
+        # sync re-reads this trailing window and skips ids already seen.
+        self.overlap = max(2 * sync_seconds, 60.0)
+        self._seen: dict[int, float] = {}
+        self._synced_at: datetime | None = None
+        self._task: asyncio.Task | None = None
+        self.synced = 0
+        self.errors = 0
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        # The first pass warms the window; later passes pick up tickets created
+        # by other processes (bot vs HTTP interaction workers).
+        while True:
+            try:
+                await self.sync()
+                self.ready = True
+            except Exception as exc:
+                self.errors += 1
+                print(f"Ticket signal sync failed: {exc}")
+            await asyncio.sleep(self.sync_seconds)
+
+    async def sync(self):
+        started = datetime.utcnow()
+        since = started - timedelta(seconds=self.window)
+        if self._synced_at:
+            since = max(since, self._synced_at - timedelta(seconds=self.overlap))
+        for row in await self.repo.list_tickets_since(since.isoformat()):
+            if row["id"] not in self._seen:
+                self.record(row)
+                self.synced += 1
+        self._synced_at = started
+        now = time.time()
+        self.tickets.prune(now)
+        self.reports.prune(now)
+        self._seen = {ticket_id: at for ticket_id, at in self._seen.items() if at > now - self.window}
+
+    def record(self, ticket: dict):
+        if ticket["id"] in self._seen:
+            return
+        at = _epoch(ticket["created_at"])
+        self._seen[ticket["id"]] = at
+        guild_id = str(ticket["guild_id"])
+        self.tickets.add((guild_id, str(ticket["creator_id"])), at)
+        for target in report_targets(ticket.get("query_text")):
+            self.reports.add((guild_id, target), at)
+
+    # Both return None until the first sync, so callers can fall back to a query.
+    def recent_tickets(self, guild_id: str, user_id: str):
+        return self.tickets.count((str(guild_id), str(user_id))) if self.ready else None
+
+    def repeated_reports(self, guild_id: str, text: str | None):
+        if not self.ready:
+            return None
+        return max((self.reports.count((str(guild_id), target)) for target in report_targets(text)), default=0)
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "users": len(self.tickets),
+            "targets": len(self.reports),
+            "tracked_tickets": len(self._seen),
+            "synced": self.synced,
+            "errors": self.errors,
+        }
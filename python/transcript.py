@@ -1,18 +1,54 @@
-import io
+import gzip
 import html
+import tempfile
 from datetime import datetime
 
+_HEAD = "<html><head><meta charset='utf-8'><style>body{font-family:Arial;background:#111;color:#ddd}p{margin:8px 0}</style></head><body>"
+_TAIL = "</body></html>"
 
-async def build_transcript(channel):
-    lines = []
-    async for msg in channel.history(limit=None, oldest_first=True):
-        author = html.escape(f"{msg.author} ({msg.author.id})")
-        content = html.escape(msg.content or "")
-        created = msg.created_at.strftime("%Y-%m-%d %H:%M:%S UTC")
-        lines.append(f"<p><strong>{author}</strong> <em>{created}</em><br>{content}</p>")
 
-    html_body = "<html><head><meta charset='utf-8'><style>body{font-family:Arial;background:#111;color:#ddd}p{margin:8px 0}</style></head><body>"
-    html_body += "\n".join(lines)
-    html_body += "</body></html>"
-    buf = io.BytesIO(html_body.encode("utf-8"))
-    return {"buffer": buf, "filename": f"ticket-transcript-{int(datetime.utcnow().timestamp())}.html"}
+def author_name(author: dict):
+    name = author.get("username") or "unknown"
+    if author.get("discriminator") not in (None, "0"):
+        name = f"{name}#{author['discriminator']}"
+    return name
+
+
+def _author(msg: dict):
+    author = msg.get("author") or {}
+    return f"{author_name(author)} ({author.get('id')})"
+
+
+def render_message(msg: dict):
+    author = html.escape(_author(msg))
+    content = html.escape(msg.get("content") or "")
+    created = datetime.fromisoformat(msg["timestamp"].replace("Z", "+00:00")).strftime("%Y-%m-%d %H:%M:%S UTC")
+    edited = " <em>(edited)</em>" if msg.get("edited_timestamp") else ""
+    files = "".join(
+        f"<br><a href='{html.escape(a.get('url') or '', quote=True)}'>{html.escape(a.get('filename') or 'attachment')}</a>"
+        for a in msg.get("attachments") or []
+    )
+    return f"<p><strong>{author}</strong> <em>{created}</em>{edited}<br>{content}{files}</p>"
+
+
+async def build_transcript(messages, spool_bytes: int = 1024 * 1024, compress: bool = False):
+    # Each message is written as soon as it arrives; the spool moves to disk past
+    # spool_bytes, so memory stays flat however long the channel is.
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    out = gzip.GzipFile(fileobj=spool, mode="wb") if compress else spool
+    try:
+        out.write(_HEAD.encode("utf-8"))
+        count = 0
+        async for msg in messages:
+            out.write((("\n" if count else "") + render_message(msg)).encode("utf-8"))
+            count += 1
+        out.write(_TAIL.encode("utf-8"))
+        if compress:
+            out.close()
+        size = spool.tell()
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    suffix = ".html.gz" if compress else ".html"
+    return {"file": spool, "filename": f"ticket-transcript-{int(datetime.utcnow().timestamp())}{suffix}", "messages": count, "bytes": size}
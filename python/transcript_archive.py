@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+from .transcript import author_name
+
+DISCORD_EPOCH_MS = 1420070400000
+
+
+def snowflake_at(seconds: float):
+    return (int(seconds * 1000) - DISCORD_EPOCH_MS) << 22
+
+
+def archive_row(channel_id: str, msg: dict):
+    author = msg.get("author") or {}
+    return {
+        "channel_id": str(channel_id),
+        "message_id": int(msg["id"]),
+        "author_id": str(author["id"]) if author.get("id") else None,
+        "author_name": author_name(author),
+        "content": msg.get("content") or "",
+        "attachments": [{"filename": a.get("filename"), "url": a.get("url"), "size": a.get("size")} for a in msg.get("attachments") or []],
+        "created_at": msg.get("timestamp"),
+        "edited_at": msg.get("edited_timestamp"),
+    }
+
+
+def message_from_row(row: dict):
+    # Shaped like a REST message so the transcript renders both sources alike.
+    return {
+        "id": str(row["message_id"]),
+        "author": {"id": row.get("author_id"), "username": row.get("author_name")},
+        "content": row.get("content") or "",
+        "attachments": row.get("attachments") or [],
+        "timestamp": row["created_at"],
+        "edited_timestamp": row.get("edited_at"),
+    }
+
+
+def gateway_message(message):
+    return {
+        "id": str(message.id),
+        "author": {"id": str(message.author.id), "username": message.author.name, "discriminator": message.author.discriminator},
+        "content": message.content or "",
+        "attachments": [{"filename": a.filename, "url": a.url, "size": a.size} for a in message.attachments],
+        "timestamp": message.created_at.isoformat(),
+        "edited_timestamp": message.edited_at.isoformat() if message.edited_at else None,
+    }
+
+
+class TranscriptArchive:
+    def __init__(self, repo, interval: float = 2.0):
+        self.repo = repo
+        self.interval = interval
+        self.session_start = snowflake_at(time.time())
+        self._pending: dict[tuple[str, int], dict] = {}
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self.captured = 0
+        self.edits = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.errors = 0
+
+    def mark_session(self):
+        # Called on every (re)identify: anything sent while disconnected is a gap
+        # that only a transcript fill from Discord can close.
+        self.session_start = snowflake_at(time.time())
+
+    def capture(self, channel_id: str, msg: dict):
+        row = archive_row(channel_id, msg)
+        self._pending[(row["channel_id"], row["message_id"])] = row
+        self.captured += 1
+
+    def capture_edit(self, channel_id: str, data: dict):
+        if "content" not in data:
+            return
+        key = (str(channel_id), int(data["id"]))
+        pending = self._pending.get(key)
+        if pending:
+            edited = archive_row(channel_id, data)
+            pending.update(content=edited["content"], attachments=edited["attachments"], edited_at=edited["edited_at"])
+        elif data.get("author") and data.get("timestamp"):
+            self._pending[key] = archive_row(channel_id, data)
+        else:
+            return
+        self.edits += 1
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as exc:
+                print(f"Transcript archive flush failed: {exc}")
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            try:
+                await self.repo.archive_ticket_messages(list(batch.values()), self.session_start)
+            except Exception:
+                self.errors += 1
+                # Newer captures (e.g. an edit that arrived mid-flush) win.
+                self._pending = {**batch, **self._pending}
+                raise
+            self.flushes += 1
+            self.rows_written += len(batch)
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "captured": self.captured,
+            "edits": self.edits,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "errors": self.errors,
+        }
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+
+class _Job:
+    def __init__(self, guild_id: str, listener):
+        self.guild_id = guild_id
+        self.listeners = [listener]
+        self.state = "queued"
+        self.messages = 0
+        self.future: asyncio.Future | None = None
+        self.pushed_at = 0.0
+        self.push: asyncio.Task | None = None
+
+
+class TranscriptQueue:
+    def __init__(self, build, global_limit: int = 2, guild_limit: int = 1, progress_interval: float = 2.0):
+        # build(ticket, progress) does the scan and upload; progress(count) may be
+        # called as often as it likes, listeners are only told every interval.
+        self.build = build
+        self.guild_limit = guild_limit
+        self.progress_interval = progress_interval
+        self._global = asyncio.Semaphore(global_limit)
+        self._guilds: dict[str, list] = {}
+        self._jobs: dict[int, _Job] = {}
+        self.requested = 0
+        self.merged = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def request(self, ticket: dict, listener):
+        # One scan per ticket: later requesters wait on the running job and are
+        # told its progress too.
+        self.requested += 1
+        ticket_id = ticket["id"]
+        job = self._jobs.get(ticket_id)
+        if job:
+            self.merged += 1
+            job.listeners.append(listener)
+            await self._tell(listener, job)
+        else:
+            job = self._jobs[ticket_id] = _Job(str(ticket["guild_id"]), listener)
+            job.future = asyncio.ensure_future(self._run(ticket, job))
+            job.future.add_done_callback(lambda _: self._jobs.pop(ticket_id, None))
+        return await asyncio.shield(job.future)
+
+    async def _run(self, ticket: dict, job: _Job):
+        slot = self._guilds.setdefault(job.guild_id, [asyncio.Semaphore(self.guild_limit), 0])
+        slot[1] += 1
+        try:
+            if slot[0].locked() or self._global.locked():
+                await self._notify(job)
+            # Guild slot first, so one busy guild queues behind itself without
+            # holding global slots other guilds could use.
+            async with slot[0], self._global:
+                job.state = "running"
+                await self._notify(job)
+                result = await self.build(ticket, lambda count: self._progress(job, count))
+            if job.push:
+                await job.push
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                self._guilds.pop(job.guild_id, None)
+
+    def _progress(self, job: _Job, count: int):
+        job.messages = count
+        if time.monotonic() - job.pushed_at >= self.progress_interval and (job.push is None or job.push.done()):
+            job.push = asyncio.create_task(self._notify(job))
+
+    async def _notify(self, job: _Job):
+        job.pushed_at = time.monotonic()
+        await asyncio.gather(*(self._tell(listener, job) for listener in list(job.listeners)))
+
+    async def _tell(self, listener, job: _Job):
+        try:
+            await listener(job.state, job.messages)
+        except Exception as exc:
+            print(f"Transcript progress update failed: {exc}")
+
+    def stats(self):
+        return {
+            "running": sum(1 for job in self._jobs.values() if job.state == "running"),
+            "queued": sum(1 for job in self._jobs.values() if job.state == "queued"),
+            "guilds": len(self._guilds),
+            "requested": self.requested,
+            "merged": self.merged,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
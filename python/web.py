@@ -1,4 +1,7 @@
+import atexit
 import secrets
+import threading
+from dataclasses import replace
 from pathlib import Path
 from urllib.parse import urlencode
 
@@ -7,11 +10,13 @@ import asyncio
 from datetime import datetime, timezone, timedelta
 from flask import Flask, redirect, request, send_from_directory, session, url_for, jsonify
 
+from .analysis import normalize_keywords
 from .config import load_config
-from .supabase_client import build_supabase
+from .supabase_client import build_data_backend
 from .data import DataRepo
 from .panels import render_settings_panel, render_open_panel
 from .discord_rest import DiscordRest
+from .interactions import PING, InteractionContext, InteractionHandlers, verify_signature
 
 BASE_DIR = Path(__file__).resolve().parent
 _candidates = [
@@ -24,9 +29,18 @@ DASHBOARD_DIR = next((p for p in _candidates if p.exists()), (BASE_DIR.parent /
 app = Flask(__name__, static_folder=str(DASHBOARD_DIR), static_url_path="")
 config = load_config()
 app.secret_key = config.session_secret or "dev-secret"
-supabase = build_supabase(config)
-repo = DataRepo(supabase)
+supabase = build_data_backend(config)
+repo = DataRepo(supabase, config.cache_ttl_seconds, config.cache_max_guilds, config.context_cache_ttl_seconds)
 rest = DiscordRest(config.discord_token)
+# Charts render on threads here: a worker pool would fork from this multi-threaded
+# process, and spawned workers would re-run this module's startup.
+handlers = InteractionHandlers(replace(config, chart_workers=0), rest, repo)
+
+# One long-lived loop for every request thread, so pooled clients (Discord REST
+# session, async PostgREST) keep their connections between requests.
+_loop = asyncio.new_event_loop()
+threading.Thread(target=_loop.run_forever, name="swiftticket-async", daemon=True).start()
+_loop.call_soon_threadsafe(handlers.signals.start)
 
 
 PERM_MANAGE_GUILD = 0x20
@@ -352,6 +366,7 @@ def api_settings():
         "enable_smart_replies": bool(data.get("enable_smart_replies")),
         "enable_ai_suggestions": bool(data.get("enable_ai_suggestions")),
         "enable_auto_priority": bool(data.get("enable_auto_priority")),
+        "custom_keywords": normalize_keywords(data.get("custom_keywords")),
     }
     saved = asyncio_run(repo.upsert_guild_settings(payload))
     return jsonify(saved or payload)
@@ -388,7 +403,7 @@ def api_categories():
         data = request.json or {}
         category_id = data.get("category_id")
         if category_id:
-            supabase.table("ticket_categories").delete().eq("id", int(category_id)).eq("guild_id", guild_id).execute()
+            asyncio_run(repo.delete_category(guild_id, int(category_id)))
         return jsonify({"ok": True})
 
 
@@ -435,19 +450,43 @@ def api_post_panelset():
     return jsonify({"ok": True})
 
 
+@app.route("/interactions", methods=["POST"])
+def interactions():
+    if not config.discord_public_key:
+        return jsonify({"error": "DISCORD_PUBLIC_KEY missing"}), 503
+    body = request.get_data()
+    signature = request.headers.get("X-Signature-Ed25519", "")
+    timestamp = request.headers.get("X-Signature-Timestamp", "")
+    if not verify_signature(config.discord_public_key, signature, timestamp, body):
+        return "invalid request signature", 401
+    payload = request.get_json(force=True)
+    if payload.get("type") == PING:
+        return jsonify({"type": 1})
+    ctx = InteractionContext.from_payload(payload)
+    response = jsonify(asyncio_run(handlers.serve_http(ctx)))
+    # Follow-up webhook calls wait until this reply has actually been sent.
+    response.call_on_close(lambda: _loop.call_soon_threadsafe(handlers.mark_delivered, ctx))
+    return response
+
+
 @app.route("/health")
 def health():
-    return jsonify({"ok": True, "dashboard_dir": str(DASHBOARD_DIR), "dashboard_exists": DASHBOARD_DIR.exists()})
+    return jsonify({"ok": True, "dashboard_dir": str(DASHBOARD_DIR), "dashboard_exists": DASHBOARD_DIR.exists(), "repo": repo.stats(), "rest": rest.stats(), "renders": handlers.renders.stats(), "interactions": handlers.router.stats(), "charts": handlers.charts.stats(), "transcripts": handlers.transcripts.stats(), "signals": handlers.signals.stats(), "similar": handlers.similar.stats(), "duplicates": handlers.duplicates.stats(), "mod_counts": handlers.mod_counts.stats(), "ticket_create": {stage: h.stats() for stage, h in handlers.create_stages.items()}})
 
 
 def asyncio_run(coro):
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = None
-    if loop and loop.is_running():
-        return asyncio.run_coroutine_threadsafe(coro, loop).result()
-    return asyncio.run(coro)
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+
+@atexit.register
+def _shutdown():
+    if _loop.is_running():
+        asyncio_run(handlers.signals.stop())
+        asyncio_run(handlers.renders.drain())
+        handlers.charts.close()
+        asyncio_run(rest.close())
+        asyncio_run(repo.close())
+        _loop.call_soon_threadsafe(_loop.stop)
 
 
 def _build_trend(rows: list[dict], start: datetime, days: int):
@@ -0,0 +1,82 @@
+import asyncio
+
+
+class TicketActivityBuffer:
+    def __init__(self, repo, interval: float = 2.0, on_flush=None):
+        self.repo = repo
+        self.interval = interval
+        self.on_flush = on_flush
+        self._pending: dict[int, dict] = {}
+        self._inflight: dict[int, dict] = {}
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self.merged = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.errors = 0
+
+    def apply(self, ticket: dict):
+        # Readers must see fields that are queued or being written, otherwise
+        # counters like response_count would be recomputed from stale rows.
+        ticket_id = ticket["id"]
+        return {**ticket, **self._inflight.get(ticket_id, {}), **self._pending.get(ticket_id, {})}
+
+    def merge(self, ticket_id: int, fields: dict):
+        self._pending.setdefault(ticket_id, {}).update(fields)
+        self.merged += 1
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as exc:
+                print(f"Ticket activity flush failed: {exc}")
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            self._inflight, self._pending = self._pending, {}
+            updates = [{"id": ticket_id, **fields} for ticket_id, fields in self._inflight.items()]
+            try:
+                rows = await self.repo.apply_ticket_activity(updates)
+            except BaseException as exc:
+                # Also on cancellation (stop() mid-flush), so the final flush
+                # rewrites the batch; the updates are absolute values, so a
+                # batch that did commit is safe to write again.
+                if isinstance(exc, Exception):
+                    self.errors += 1
+                for ticket_id, fields in self._inflight.items():
+                    self._pending[ticket_id] = {**fields, **self._pending.get(ticket_id, {})}
+                raise
+            finally:
+                self._inflight = {}
+            self.flushes += 1
+            self.rows_written += len(rows)
+            if self.on_flush:
+                for row in rows:
+                    self.on_flush(self.apply(row))
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "merged": self.merged,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "errors": self.errors,
+        }
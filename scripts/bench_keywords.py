@@ -0,0 +1,50 @@
+"""Compare the compiled keyword matcher with the old per-word substring scans.
+
+Run from the repo root: python -m scripts.bench_keywords
+"""
+import random
+import timeit
+
+from python.analysis import AGGRESSIVE_WORDS, SUGGESTIONS, normalize_keywords, scan_text
+
+
+def legacy_scan(text: str, extra: list[str] = ()):
+    # What on_message used to do: two lowercase + linear substring passes.
+    lower = text.lower()
+    flagged = [w for w in [*AGGRESSIVE_WORDS, *extra] if w in lower]
+    lower = text.lower()
+    return {"flagged": flagged, "suggestions": [s for k, s in SUGGESTIONS if k in lower]}
+
+
+def sample_messages(count: int = 2000, seed: int = 7):
+    rng = random.Random(seed)
+    filler = "hello please help my order did not arrive yet thanks the skill steamroll account login support".split()
+    keywords = AGGRESSIVE_WORDS + [k for k, _ in SUGGESTIONS]
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(filler) for _ in range(rng.randint(5, 60))]
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        messages.append(" ".join(words))
+    return messages
+
+
+def main():
+    messages = sample_messages()
+    custom = {"custom_keywords": normalize_keywords([f"customword{i}" for i in range(40)])}
+    cases = [
+        ("legacy substring scan", lambda: [legacy_scan(m) for m in messages]),
+        ("compiled matcher", lambda: [scan_text(m) for m in messages]),
+        ("legacy scan + 40 custom words", lambda: [legacy_scan(m, custom["custom_keywords"]) for m in messages]),
+        ("compiled matcher + 40 custom words", lambda: [scan_text(m, custom) for m in messages]),
+    ]
+    for name, fn in cases:
+        fn()
+        best = min(timeit.repeat(fn, number=5, repeat=5)) / 5
+        print(f"{name:<36} {best * 1e6 / len(messages):7.2f} us/message")
+    skill = "I have the skill to steamroll this"
+    print(f"\n{skill!r}: legacy={legacy_scan(skill)['flagged']} compiled={scan_text(skill)['flagged']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Build a similar-ticket index over synthetic tickets and time lookups.
+
+Run from the repo root: python -m scripts.bench_similar [tickets]
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+from python.similar import GuildIndex, build_index
+
+TOPICS = [
+    "refund order payment card charged twice invoice",
+    "ban appeal banned account wrongly moderator reason",
+    "scam trade item stolen screenshots user",
+    "nitro gift code redeem expired",
+    "role verification missing permissions channel access",
+    "bot command error crash slash interaction",
+    "giveaway winner prize claim delivered",
+    "report harassment dm threats spam",
+]
+
+
+def synthetic_tickets(count: int, seed: int = 11):
+    rng = random.Random(seed)
+    # Zipf-ish filler vocabulary so posting lists have a realistic long tail.
+    filler = [f"w{i}" for i in range(20000)]
+    weights = [1 / (i + 1) for i in range(len(filler))]
+    tickets = []
+    for ticket_id in range(1, count + 1):
+        topic = rng.choice(TOPICS).split()
+        words = rng.sample(topic, k=rng.randint(2, len(topic))) + rng.choices(filler, weights, k=rng.randint(4, 30))
+        rng.shuffle(words)
+        tickets.append({"id": ticket_id, "query_text": " ".join(words)})
+    return tickets
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    tickets = synthetic_tickets(count)
+    started = time.perf_counter()
+    index = build_index(tickets)
+    build_s = time.perf_counter() - started
+    nnz = sum(len(d) for d in index.docs)
+    print(f"bulk build: {count} tickets, {len(index.vocab)} terms, {nnz} postings in {build_s:.2f}s")
+
+    incremental = GuildIndex()
+    started = time.perf_counter()
+    for ticket in tickets[:20000]:
+        incremental.add(ticket["id"], ticket["query_text"])
+    print(f"incremental: {(time.perf_counter() - started) / 20000 * 1e6:.1f} us per closed ticket (20k adds, with renormalization)")
+
+    started = time.perf_counter()
+    index.normalize()
+    print(f"renormalize: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    queries = [t["query_text"] for t in synthetic_tickets(500, seed=99)]
+    timings = []
+    for text in queries:
+        started = time.perf_counter()
+        index.query(text, k=3)
+        timings.append((time.perf_counter() - started) * 1000)
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    print(f"top-3 query: p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms over {len(queries)} queries")
+    print("example:", queries[0][:60], "->", index.query(queries[0], k=3))
+
+
+if __name__ == "__main__":
+    main()
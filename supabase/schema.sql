@@ -24,14 +24,20 @@ create table if not exists public.tickets (
   last_staff_message_at timestamptz,
   avg_response_ms integer,
   response_count integer default 0,
-  query_text text not null
+  query_text text not null,
+  archive_cursor bigint,
+  minhash text
 );
 
+alter table public.tickets add column if not exists archive_cursor bigint;
+alter table public.tickets add column if not exists minhash text;
+
 create index if not exists tickets_guild_idx on public.tickets (guild_id);
 create index if not exists tickets_creator_idx on public.tickets (creator_id);
 create index if not exists tickets_claimed_idx on public.tickets (claimed_by);
 create index if not exists tickets_closed_idx on public.tickets (closed_by);
 create index if not exists tickets_created_at_idx on public.tickets (created_at desc);
+create index if not exists tickets_guild_creator_created_idx on public.tickets (guild_id, creator_id, created_at desc);
 
 create table if not exists public.ticket_links (
   id bigserial primary key,
@@ -44,6 +50,20 @@ create table if not exists public.ticket_links (
 
 create index if not exists ticket_links_ticket_idx on public.ticket_links (ticket_id);
 
+-- Append-only copy of ticket channel messages, keyed by channel so capture does
+-- not depend on the ticket row existing yet. Edits overwrite content in place.
+create table if not exists public.ticket_messages (
+  channel_id text not null,
+  message_id bigint not null,
+  author_id text,
+  author_name text,
+  content text not null default '',
+  attachments jsonb not null default '[]'::jsonb,
+  created_at timestamptz,
+  edited_at timestamptz,
+  primary key (channel_id, message_id)
+);
+
 create table if not exists public.mod_actions (
   id bigserial primary key,
   guild_id text not null,
@@ -66,9 +86,12 @@ create table if not exists public.guild_settings (
   warn_timeout_minutes integer default 10,
   enable_smart_replies boolean default true,
   enable_ai_suggestions boolean default true,
-  enable_auto_priority boolean default true
+  enable_auto_priority boolean default true,
+  custom_keywords text[] not null default '{}'
 );
 
+alter table public.guild_settings add column if not exists custom_keywords text[] not null default '{}';
+
 create table if not exists public.ticket_categories (
   id bigserial primary key,
   guild_id text not null,
@@ -78,3 +101,156 @@ create table if not exists public.ticket_categories (
 );
 
 create index if not exists ticket_categories_guild_idx on public.ticket_categories (guild_id);
+
+create or replace function public.mod_action_summary(p_guild_id text, p_user_id text)
+returns table (warnings bigint, mutes bigint, bans bigint)
+language sql stable
+as $$
+  select
+    count(*) filter (where action_type = 'WARN'),
+    count(*) filter (where action_type = 'MUTE'),
+    count(*) filter (where action_type = 'BAN')
+  from public.mod_actions
+  where guild_id = p_guild_id and user_id = p_user_id;
+$$;
+
+create or replace function public.user_ticket_stats(p_guild_id text, p_user_id text)
+returns table (created bigint, claimed bigint, closed bigint)
+language sql stable
+as $$
+  select
+    count(*) filter (where creator_id = p_user_id),
+    count(*) filter (where claimed_by = p_user_id),
+    count(*) filter (where closed_by = p_user_id)
+  from public.tickets
+  where guild_id = p_guild_id
+    and (creator_id = p_user_id or claimed_by = p_user_id or closed_by = p_user_id);
+$$;
+
+create or replace function public.user_ticket_history(p_guild_id text, p_user_id text)
+returns table (total bigint, last timestamptz)
+language sql stable
+as $$
+  select
+    (select count(*) from public.tickets where guild_id = p_guild_id and creator_id = p_user_id),
+    (select coalesce(closed_at, created_at) from public.tickets
+      where guild_id = p_guild_id and creator_id = p_user_id
+      order by created_at desc
+      limit 1);
+$$;
+
+-- Lets ticket creation post the ticket message before inserting the row.
+create or replace function public.next_ticket_id()
+returns bigint
+language sql volatile
+as $$
+  select nextval(pg_get_serial_sequence('public.tickets', 'id'));
+$$;
+
+-- Batched write-behind of per-message ticket activity. Fields missing from an
+-- update keep their current value; first-response fields are only set once.
+create or replace function public.apply_ticket_activity(p_updates jsonb)
+returns setof public.tickets
+language sql
+as $$
+  update public.tickets t set
+    last_user_message_at = coalesce(u.last_user_message_at, t.last_user_message_at),
+    last_staff_message_at = coalesce(u.last_staff_message_at, t.last_staff_message_at),
+    first_staff_response_at = coalesce(t.first_staff_response_at, u.first_staff_response_at),
+    first_response_ms = coalesce(t.first_response_ms, u.first_response_ms),
+    avg_response_ms = coalesce(u.avg_response_ms, t.avg_response_ms),
+    response_count = coalesce(u.response_count, t.response_count)
+  from jsonb_to_recordset(p_updates) as u(
+    id bigint,
+    last_user_message_at timestamptz,
+    last_staff_message_at timestamptz,
+    first_staff_response_at timestamptz,
+    first_response_ms integer,
+    avg_response_ms integer,
+    response_count integer
+  )
+  where t.id = u.id
+  returning t.*;
+$$;
+
+-- Archives captured messages, then advances each ticket's archive_cursor (the
+-- message id up to which its archive is known to be complete). A capturing
+-- process passes the snowflake of its gateway session start: the cursor only
+-- moves if it already lies inside that session, i.e. nothing was missed while
+-- disconnected. Gap fills read straight from Discord pass 0.
+create or replace function public.archive_ticket_messages(p_rows jsonb, p_session_start bigint)
+returns void
+language sql
+as $$
+  insert into public.ticket_messages as m (channel_id, message_id, author_id, author_name, content, attachments, created_at, edited_at)
+  select r.channel_id, r.message_id, r.author_id, r.author_name, coalesce(r.content, ''), coalesce(r.attachments, '[]'::jsonb), r.created_at, r.edited_at
+  from jsonb_to_recordset(p_rows) as r(
+    channel_id text,
+    message_id bigint,
+    author_id text,
+    author_name text,
+    content text,
+    attachments jsonb,
+    created_at timestamptz,
+    edited_at timestamptz
+  )
+  on conflict (channel_id, message_id) do update set
+    content = excluded.content,
+    attachments = excluded.attachments,
+    edited_at = coalesce(excluded.edited_at, m.edited_at);
+
+  update public.tickets t set archive_cursor = greatest(coalesce(t.archive_cursor, 0), c.last_id)
+  from (
+    select r.channel_id, max(r.message_id) as last_id
+    from jsonb_to_recordset(p_rows) as r(channel_id text, message_id bigint)
+    group by r.channel_id
+  ) c
+  where t.channel_id = c.channel_id
+    and coalesce(t.archive_cursor, t.channel_id::bigint) >= p_session_start;
+$$;
+
+-- Generic grouped count: p_filters applies to every row, p_counts maps a result
+-- key to extra equality filters, e.g.
+-- multi_count('tickets', '{"guild_id":"1"}', '{"open":{"status":"OPEN"},"all":{}}')
+create or replace function public.multi_count(p_table text, p_filters jsonb, p_counts jsonb)
+returns jsonb
+language plpgsql stable
+as $$
+declare
+  where_sql text;
+  select_sql text := '';
+  count_name text;
+  count_filters jsonb;
+  cond text;
+  result jsonb;
+begin
+  if p_table not in ('tickets', 'mod_actions', 'ticket_links', 'ticket_categories') then
+    raise exception 'multi_count: table % is not allowed', p_table;
+  end if;
+  select coalesce(string_agg(format('%I = %L', key, value), ' and '), 'true')
+    into where_sql
+    from jsonb_each_text(coalesce(p_filters, '{}'::jsonb));
+  for count_name, count_filters in select key, value from jsonb_each(coalesce(p_counts, '{}'::jsonb)) loop
+    select coalesce(string_agg(format('%I = %L', key, value), ' and '), 'true')
+      into cond
+      from jsonb_each_text(count_filters);
+    select_sql := select_sql
+      || case when select_sql = '' then '' else ', ' end
+      || format('%L, count(*) filter (where %s)', count_name, cond);
+  end loop;
+  if select_sql = '' then
+    return '{}'::jsonb;
+  end if;
+  execute format('select jsonb_build_object(%s) from public.%I where %s', select_sql, p_table, where_sql)
+    into result;
+  return result;
+end;
+$$;
+
+revoke execute on function public.mod_action_summary(text, text) from public, anon, authenticated;
+revoke execute on function public.user_ticket_stats(text, text) from public, anon, authenticated;
+revoke execute on function public.user_ticket_history(text, text) from public, anon, authenticated;
+revoke execute on function public.apply_ticket_activity(jsonb) from public, anon, authenticated;
+revoke execute on function public.multi_count(text, jsonb, jsonb) from public, anon, authenticated;
+revoke execute on function public.archive_ticket_messages(jsonb, bigint) from public, anon, authenticated;
+revoke execute on function public.next_ticket_id() from public, anon, authenticated;
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from python.duplicates import DuplicateDetector, encode_signature, signature
+from python.similar import SimilarTickets
+from python.ticket_signals import TicketSignals
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class FakeRepo:
+    # Rows only become visible once committed, in whatever order the test commits them.
+    def __init__(self):
+        self.committed: dict[int, dict] = {}
+
+    def commit(self, ticket_id: int, text: str, **fields):
+        now = datetime.utcnow().isoformat()
+        self.committed[ticket_id] = {
+            "id": ticket_id,
+            "guild_id": "1",
+            "creator_id": str(100 + ticket_id),
+            "query_text": text,
+            "minhash": encode_signature(signature(text)),
+            "created_at": now,
+            "status": "OPEN",
+            "closed_at": None,
+            **fields,
+        }
+
+    def _rows(self, column: str, since: str | None):
+        return [row for _, row in sorted(self.committed.items()) if not since or (row[column] and row[column] >= since)]
+
+    async def list_tickets_since(self, since_iso: str, after_id: int = 0):
+        return [row for row in self._rows("created_at", since_iso) if row["id"] > after_id]
+
+    async def list_ticket_signatures(self, guild_id: str, created_since: str | None = None):
+        return self._rows("created_at", created_since)
+
+    async def list_closed_ticket_texts(self, guild_id: str, closed_since: str | None = None):
+        return [row for row in self._rows("closed_at", closed_since) if row["status"] == "CLOSED"]
+
+
+def ago(seconds: float):
+    return (datetime.utcnow() - timedelta(seconds=seconds)).isoformat()
+
+
+def test_signals_pick_up_a_lower_id_committed_after_a_sync():
+    async def main():
+        repo = FakeRepo()
+        signals = TicketSignals(repo, sync_seconds=30.0)
+        # Ticket 1 was stamped first but commits after ticket 2 and after a sync.
+        late_created = ago(5)
+        repo.commit(2, "second")
+        await signals.sync()
+        repo.commit(1, "first", created_at=late_created)
+        await signals.sync()
+        await signals.sync()
+        assert set(signals._seen) == {1, 2}
+        assert signals.synced == 2
+
+    run(main())
+
+
+def test_duplicate_index_picks_up_a_lower_id_committed_after_a_sync():
+    async def main():
+        repo = FakeRepo()
+        detector = DuplicateDetector(repo, sync_seconds=60.0)
+        late_created = ago(5)
+        repo.commit(2, "my account was hacked and the password changed")
+        index = await detector._load("1")
+        repo.commit(1, "the printer on floor three is out of toner again", created_at=late_created)
+        await detector._extend("1", index)
+        await detector._extend("1", index)
+        assert set(index.signatures) == {1, 2}
+        assert [m["ticket_id"] for m in index.query(signature("the printer on floor three is out of toner again"), 0.9)] == [1]
+
+    run(main())
+
+
+def test_similar_index_picks_up_a_close_committed_after_a_sync():
+    async def main():
+        repo = FakeRepo()
+        similar = SimilarTickets(repo, sync_seconds=60.0)
+        late_closed = ago(5)
+        repo.commit(2, "refund for a duplicate charge", status="CLOSED", closed_at=ago(1))
+        index = await similar._load("1")
+        repo.commit(1, "cannot log in after password reset", status="CLOSED", closed_at=late_closed)
+        await similar._sync("1", index)
+        await similar._sync("1", index)
+        assert len(index) == 2
+        assert similar.added == 1
+
+    run(main())
@@ -0,0 +1,94 @@
+import json
+import os
+import time
+
+from nacl.signing import SigningKey
+
+SIGNING_KEY = SigningKey.generate()
+os.environ.update({
+    "DISCORD_PUBLIC_KEY": SIGNING_KEY.verify_key.encode().hex(),
+    "DISCORD_TOKEN": "token",
+    "DATA_BACKEND": "async",
+    "SUPABASE_URL": "http://127.0.0.1:9",
+    "SUPABASE_SERVICE_ROLE_KEY": "key",
+})
+
+from python import web  # noqa: E402
+from python.interactions import APPLICATION_COMMAND  # noqa: E402
+
+client = web.app.test_client()
+
+
+def post(payload: dict, timestamp: int | None = None, key: SigningKey = SIGNING_KEY):
+    body = json.dumps(payload).encode()
+    timestamp = str(int(time.time()) if timestamp is None else timestamp)
+    signature = key.sign(timestamp.encode() + body).signature.hex()
+    return client.post("/interactions", data=body, headers={
+        "Content-Type": "application/json",
+        "X-Signature-Ed25519": signature,
+        "X-Signature-Timestamp": timestamp,
+    })
+
+
+def command(name: str, options: list | None = None):
+    return {
+        "id": "1",
+        "token": "interaction-token",
+        "type": APPLICATION_COMMAND,
+        "application_id": "2",
+        "channel_id": "3",
+        "user": {"id": "4", "username": "tester"},
+        "data": {"name": name, "options": options or []},
+    }
+
+
+def test_bad_signature_is_rejected():
+    assert post({"type": 1}, key=SigningKey.generate()).status_code == 401
+
+
+def test_stale_timestamp_is_rejected():
+    assert post({"type": 1}, timestamp=int(time.time()) - 600).status_code == 401
+
+
+def test_ping_gets_pong():
+    res = post({"type": 1})
+    assert res.status_code == 200
+    assert res.get_json() == {"type": 1}
+
+
+def test_command_is_dispatched_and_answered_in_the_http_reply():
+    # /mod config from a DM: the handler answers straight away with a notice.
+    res = post(command("mod", [{"name": "config", "options": []}]))
+    assert res.status_code == 200
+    reply = res.get_json()
+    assert reply["type"] == 4
+    assert "Not allowed" in json.dumps(reply["data"])
+
+
+def test_followups_wait_until_the_reply_is_delivered(monkeypatch):
+    delivered = []
+    edits = []
+
+    async def probe(ctx, params):
+        await web.handlers.notice(ctx, "info", "First", "initial reply")
+        await web.handlers.notice(ctx, "info", "Second", "edits the original")
+
+    async def edit_original_response(app_id, token, payload):
+        edits.append(bool(delivered))
+
+    mark_delivered = web.handlers.mark_delivered
+
+    def record_delivery(ctx):
+        delivered.append(ctx.id)
+        mark_delivered(ctx)
+
+    web.handlers.router.add(APPLICATION_COMMAND, "probe", probe, None)
+    monkeypatch.setattr(web.handlers, "mark_delivered", record_delivery)
+    monkeypatch.setattr(web.rest, "edit_original_response", edit_original_response)
+    res = post(command("probe"))
+    assert "First" in json.dumps(res.get_json())
+    res.close()
+    deadline = time.monotonic() + 2
+    while not edits and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert edits == [True]
@@ -0,0 +1,153 @@
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from python.discord_rest import DiscordRest
+from python.ratelimit import PRIORITY_BACKGROUND, PRIORITY_INTERACTION, Bucket
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def fake_discord(handler):
+    # Local stand-in for discord.com: every request under /api goes to handler.
+    app = web.Application()
+    app.router.add_route("*", "/api/{tail:.*}", handler)
+    server = TestServer(app)
+    await server.start_server()
+    rest = DiscordRest("token", base=str(server.make_url("/api")))
+    return server, rest
+
+
+def limit_headers(bucket: str, remaining: int, reset_after: float, limit: int = 1):
+    return {
+        "X-RateLimit-Bucket": bucket,
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset-After": str(reset_after),
+    }
+
+
+def test_routes_sharing_a_bucket_hash_share_one_bucket():
+    async def handler(request):
+        return web.json_response({"id": "1"}, headers=limit_headers("msgs", 4, 1.0, limit=5))
+
+    async def main():
+        server, rest = await fake_discord(handler)
+        try:
+            await rest.send_channel_message(111111111111111111, {"content": "a"})
+            await rest.edit_message(111111111111111111, 222222222222222222, {"content": "b"})
+            await rest.edit_message(333333333333333333, 222222222222222222, {"content": "c"})
+            limiter = rest.limiter
+            send = limiter._bucket_for("POST /channels/111111111111111111/messages", "/channels/111111111111111111/messages")
+            edit = limiter._bucket_for("PATCH /channels/111111111111111111/messages/:id", "/channels/111111111111111111/messages/222222222222222222")
+            other = limiter._bucket_for("PATCH /channels/333333333333333333/messages/:id", "/channels/333333333333333333/messages/222222222222222222")
+            assert send is edit
+            assert other is not send
+            assert set(limiter._buckets) == {"msgs:channels/111111111111111111", "msgs:channels/333333333333333333"}
+        finally:
+            await rest.close()
+            await server.close()
+
+    run(main())
+
+
+def test_exhausted_bucket_serves_higher_priority_first():
+    order = []
+
+    async def handler(request):
+        order.append((await request.json())["tag"])
+        return web.json_response({"id": "1"}, headers=limit_headers("one", 0, 0.2))
+
+    async def main():
+        server, rest = await fake_discord(handler)
+        try:
+            path = "/channels/111111111111111111/messages"
+            await rest._request("POST", path, "first", json={"tag": "first"})
+            background = asyncio.create_task(rest._request("POST", path, "bg", priority=PRIORITY_BACKGROUND, json={"tag": "background"}))
+            await asyncio.sleep(0.02)
+            interaction = asyncio.create_task(rest._request("POST", path, "ia", priority=PRIORITY_INTERACTION, json={"tag": "interaction"}))
+            await asyncio.gather(background, interaction)
+            assert order == ["first", "interaction", "background"]
+        finally:
+            await rest.close()
+            await server.close()
+
+    run(main())
+
+
+def test_route_429_is_retried_without_stalling_other_routes():
+    hits = {"limited": 0, "free": 0}
+    finished = {}
+
+    async def handler(request):
+        if "111111111111111111" in request.path:
+            hits["limited"] += 1
+            if hits["limited"] == 1:
+                return web.json_response(
+                    {"message": "You are being rate limited.", "retry_after": 0.3, "global": False},
+                    status=429,
+                    headers={**limit_headers("slow", 0, 0.3), "X-RateLimit-Scope": "user"},
+                )
+            return web.json_response({"id": "1"}, headers=limit_headers("slow", 0, 0.3))
+        hits["free"] += 1
+        return web.json_response({"id": "2"}, headers=limit_headers("fast", 4, 1.0, limit=5))
+
+    async def main():
+        server, rest = await fake_discord(handler)
+        try:
+            started = time.monotonic()
+
+            async def timed(name, coro):
+                await coro
+                finished[name] = time.monotonic() - started
+
+            limited = asyncio.create_task(timed("limited", rest.send_channel_message(111111111111111111, {"content": "a"})))
+            await asyncio.sleep(0.05)
+            await timed("free", rest.send_channel_message(222222222222222222, {"content": "b"}))
+            await limited
+            assert hits == {"limited": 2, "free": 1}
+            assert rest.limiter.rate_limited == 1
+            assert finished["free"] < 0.25
+            assert finished["limited"] >= 0.3
+            assert rest.limiter.global_bucket.tokens > 0
+        finally:
+            await rest.close()
+            await server.close()
+
+    run(main())
+
+
+def test_headerless_bucket_waits_for_release_without_polling():
+    async def main():
+        bucket = Bucket()
+        await bucket.acquire(PRIORITY_BACKGROUND, 0)
+        waiter = asyncio.create_task(bucket.acquire(PRIORITY_BACKGROUND, 1))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        assert bucket._timer is None
+        bucket.release()
+        await asyncio.wait_for(waiter, 0.1)
+
+    run(main())
+
+
+def test_cancelled_grant_returns_global_token():
+    async def main():
+        bucket = Bucket(1, period=10.0)
+        await bucket.acquire(PRIORITY_BACKGROUND, 0)
+        waiter = asyncio.create_task(bucket.acquire(PRIORITY_BACKGROUND, 1))
+        await asyncio.sleep(0)
+        bucket.reset_at = 0
+        bucket._dispatch()
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        assert bucket.tokens == 1
+
+    run(main())